@@ -0,0 +1,251 @@
+"""
+Micro-benchmark for utils.utils.extract_author_coi.
+
+Runs the current implementation and the previous re-parsing implementation over the
+HTML fixtures in benchmarks/fixtures (small synthetic pages covering the disclosure
+layouts, not saved JCO articles) plus generated pages with many labels and authors,
+checks that both give identical output, and prints the timings.
+
+Usage:
+    python -m benchmarks.bench_extract_author_coi [--repeat 20]
+"""
+
+import argparse
+import glob
+import os
+import time
+from bs4 import BeautifulSoup
+import re
+from utils.utils import extract_author_coi, HTML_PARSER
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def legacy_extract_author_coi(html_content):
+    """
+    Reference copy of extract_author_coi before the single-pass rewrite (with the
+    per-author loop body indented as intended), used to check identical output.
+
+    Given a single HTML string, parse out each author's name
+    and their 'Conflicts of Interest' statements from any sections
+    labeled with 'Authors' Disclosures of Potential Conflicts of Interest'.
+    Skips the first author and their disclosures, which is not real author but a title.
+
+    Returns a list of dictionaries:
+    [
+      {
+        "Author": <string>,
+        "Disclosures": [<string>, <string>, ...]
+      },
+      ...
+    ]
+    """
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    # Find all headings that match "Authors' Disclosures..."
+    # We look through all heading tags (h1–h6).
+    disclosure_headings = []
+    for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        text = tag.get_text()
+        if "Authors' Disclosures of Potential Conflicts of Interest" in text or \
+            "Authors’ Disclosures of Potential Conflicts of Interest" in text:
+            disclosure_headings.append(tag)
+
+    # Helper: check if a tag is any heading
+    def is_heading(tag):
+        return tag.name in ["h1", "h2", "h3", "h4", "h5", "h6"]
+    
+    all_disclosures = []
+
+    # Parse each COI block separately
+    for i, heading in enumerate(disclosure_headings):
+        # The block ends at the next "Authors' Disclosures..." heading or EOF
+        block_end = disclosure_headings[i+1] if (i+1 < len(disclosure_headings)) else None
+
+        # Gather all siblings between this heading and block_end
+        content_tags = []
+        nxt = heading.next_sibling
+        while nxt and nxt != block_end:
+            content_tags.append(nxt)
+            nxt = nxt.next_sibling
+
+        # Create a temporary soup of just this block
+        block_soup = BeautifulSoup("".join(str(t) for t in content_tags), "html.parser")
+
+        # Find sub-headings that appear to be author names
+        # (excludes the heading that might re-mention "Authors' Disclosures...")
+        author_headings = []
+        for htag in block_soup.find_all(is_heading):
+            if "Authors' Disclosures of Potential Conflicts of Interest" not in htag.get_text():
+                author_headings.append(htag)
+
+        # For each author heading, gather the paragraphs/divs until the next author heading
+        if author_headings:
+            for j, author_tag in enumerate(author_headings):
+                # Skip the first author (j == 0)
+                if j == 0:
+                    continue
+            
+                author_name = author_tag.get_text(strip=True)
+
+                # The next heading (author) is our boundary
+                next_heading = author_headings[j+1] if (j+1 < len(author_headings)) else None
+
+                disclosures = []
+                sibling = author_tag.next_sibling
+                while sibling and sibling != next_heading:
+                    # If it's a div/p (or similar) that contains text, capture it
+                    if sibling.name in ["div", "p"]:
+                        text_content = sibling.get_text(" ", strip=True)
+                        if text_content:
+                            disclosures.append(text_content)
+                    sibling = sibling.next_sibling
+
+                # Store the data
+                all_disclosures.append({
+                    "Author": author_name,
+                    "Disclosures": disclosures
+                })
+
+        else:
+            # SCENARIO B: No author subheadings. All authors in one or more <div>/<p> blocks with <b> labels.
+            text_blocks = block_soup.find_all(["div", "p"])
+            for block in text_blocks:
+                b_tags = block.find_all("b")
+                # For each <b> label like: <b>Employment or Leadership Position:</b> ...
+                for btag in b_tags:
+                    raw_label = btag.get_text(" ", strip=True)  # e.g. "Employment or Leadership Position:"
+                    parent_text = block.get_text(" ", strip=True)
+
+                    # (A) Normalize the label
+                    #     1) Drop the word " Position" if present
+                    #     2) Ensure we have "Employment or Leadership:" form
+                    #     3) Remove trailing colon for easier pattern match
+                    label_clean = raw_label.replace(" Position", "")  # remove " Position"
+                    label_clean = re.sub(r':$', '', label_clean).strip()  # remove trailing colon
+                    # e.g. "Employment or Leadership"
+
+                    # We'll keep it consistent by re-adding a colon for final output
+                    label_clean += ":"
+
+                    # (B) Find the text chunk that belongs to this label
+                    #    We locate everything after the label, up to the next <b> label
+                    #    by scanning the entire block's text.
+                    #    We'll form a small pattern for our label, ignoring optional colon/spaces
+                    pattern_label = re.escape(raw_label.rstrip(':')) + r':?\s*(.*)'
+                    # e.g. "Employment\ or\ Leadership\ Position:?\s*(.*)"
+
+                    m = re.search(pattern_label, parent_text)
+                    if not m:
+                        continue  # can't find text after the label
+
+                    # We'll get the substring from the match
+                    authors_string = m.group(1)
+
+                    # Next label starts?
+                    # We'll gather all other <b> labels in this block and see which one starts after this
+                    all_labels_in_block = []
+                    for other_b in b_tags:
+                        other_l = other_b.get_text(" ", strip=True).rstrip(':')
+                        for mm in re.finditer(re.escape(other_l), parent_text):
+                            all_labels_in_block.append((mm.start(), other_l))
+                    all_labels_in_block.sort(key=lambda x: x[0])
+
+                    # Our substring begins at m.start(1)
+                    our_start = m.start(1)
+                    next_label_index = None
+                    for (pos, lbl) in all_labels_in_block:
+                        if pos > our_start:
+                            next_label_index = pos
+                            break
+
+                    if next_label_index:
+                        length_to_cut = next_label_index - our_start
+                        authors_string = authors_string[:length_to_cut]
+
+                    # (C) Now we have the chunk for this label, e.g.
+                    #   "Robert Weaver, Florida Cancer Specialists (C); Elizabeth Crowley, Celldex Therapeutics (C)"
+                    # Split on semicolons
+                    people_chunks = [p.strip() for p in authors_string.split(';') if p.strip()]
+
+                    for chunk in people_chunks:
+                        # chunk e.g. "Robert Weaver, Florida Cancer Specialists (C)"
+                        # We'll parse:
+                        #   - author name: everything up to the first comma
+                        #   - institution: everything after the comma, minus any trailing (C)
+                        author = chunk
+                        institution = ""
+
+                        # Attempt to split by the first comma
+                        if ',' in chunk:
+                            parts = chunk.split(',', 1)  # 1 split only
+                            author = parts[0].strip()       # e.g. "Robert Weaver"
+                            institution = parts[1].strip()  # e.g. "Florida Cancer Specialists (C)"
+
+                            # remove trailing (C) if present
+                            institution = re.sub(r'\(C\)', '', institution).strip()
+
+                        # Our final disclosure string
+                        # e.g. "Employment or Leadership: Florida Cancer Specialists"
+                        # We only append the institution if it's not empty
+                        if institution:
+                            disc = f"{label_clean} {institution}"
+                        else:
+                            disc = label_clean  # fallback if we didn't parse an institution
+
+                        all_disclosures.append({
+                            "Author": author,
+                            "Disclosures": [disc]
+                        })
+
+    return all_disclosures
+
+
+def synthetic_labels_page(n_labels, n_authors=5):
+    """An old-style page: one paragraph with `n_labels` <b> labels naming several authors each."""
+    parts = []
+    for i in range(n_labels):
+        people = '; '.join(f"Author {i}-{k}, Company {i * n_authors + k} (C)" for k in range(n_authors))
+        parts.append(f"<b>Relationship {i}:</b> {people}")
+    return ("<html><body><h2>Authors' Disclosures of Potential Conflicts of Interest</h2>"
+            f"<p>{' '.join(parts)}</p></body></html>")
+
+def synthetic_authors_page(n_authors):
+    """A new-style page with one heading and a few disclosures per author."""
+    parts = ["<h3>Article title</h3>"]
+    for i in range(n_authors):
+        parts.append(f"<h4>Author {i}</h4>")
+        parts.extend(f"<div><b>Honoraria:</b> Company {i}, Company {i + k} (Inst)</div>" for k in range(3))
+    return ("<html><body><section><h2>Authors' Disclosures of Potential Conflicts of Interest</h2>"
+            f"{''.join(parts)}</section></body></html>")
+
+def timed(function, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(html)
+    return result, (time.perf_counter() - start) / repeat
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark extract_author_coi against the previous implementation")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [(os.path.basename(path), open(path, encoding='utf-8').read())
+             for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html')))]
+    pages += [(f'synthetic_{n}_labels', synthetic_labels_page(n)) for n in (20, 100)]
+    pages += [(f'synthetic_{n}_authors', synthetic_authors_page(n)) for n in (50, 300)]
+
+    parsers = ['html.parser'] + ([HTML_PARSER] if HTML_PARSER != 'html.parser' else [])
+    print(f"{'page':32} {'entries':>7} {'legacy ms':>10} " + ' '.join(f"{p + ' ms':>16}" for p in parsers))
+    all_identical = True
+    for name, html in pages:
+        expected, legacy_time = timed(legacy_extract_author_coi, html, args.repeat)
+        times = []
+        for backend in parsers:
+            result, elapsed = timed(lambda h: extract_author_coi(h, backend), html, args.repeat)
+            times.append(elapsed)
+            if result != expected:
+                all_identical = False
+                print(f"MISMATCH on {name} with {backend}")
+        print(f"{name:32} {len(expected):>7} {legacy_time * 1000:>10.2f} " + ' '.join(f"{t * 1000:>16.2f}" for t in times))
+    print("Output identical to the previous implementation" if all_identical else "Outputs differ")
@@ -0,0 +1,282 @@
+"""
+Offline benchmark of the scrape -> extract -> label -> features pipeline.
+
+Each stage runs in its own process against local stand-ins (benchmarks/servers.py):
+
+    scrape    crawl() + the static HTTP scraper over --pages URLs served from the fixture pages
+    extract   parse_article_html / extract_author_coi over the fixture pages
+    label     the async LLM runner (utils.llm.parse_all) against a mock OpenAI endpoint
+    batch     utils.llm_batch.run_batch against the mock's Batch API, checking that every
+              result comes back to its request by custom_id
+    features  utils.coi_features.build_analysis_dataset over --articles synthetic articles
+
+and reports throughput, p50/p95 latency per item (per page, per request; per run for
+features) and the peak RSS of its process. Results are compared with a stored baseline
+(benchmarks/baseline.json, written with --save-baseline); a stage that got slower or
+bigger than --tolerance fails the run.
+
+The default fixture pages (benchmarks/fixtures) are small synthetic pages, not saved
+JCO articles, which are much larger and script-heavy; their timings are only good for
+comparing two versions of the code with each other. --fixtures points the scrape,
+extract, label and features stages at real pages: a directory of saved .html pages
+or the HTML archive the scraper keeps (data/html_archive). No baseline is committed,
+since the numbers depend on the machine and the pages.
+
+Usage:
+    python -m benchmarks.bench_pipeline --save-baseline          # on the base commit
+    python -m benchmarks.bench_pipeline                          # after a change
+    python -m benchmarks.bench_pipeline --stages label --llm-latency 0.2
+    python -m benchmarks.bench_pipeline --fixtures data/html_archive   # real archived pages
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+STAGES = ['scrape', 'extract', 'label', 'batch', 'features']
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def quantile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def summary(items, elapsed, latencies):
+    return {
+        'items': items,
+        'seconds': round(elapsed, 3),
+        'throughput': round(items / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(quantile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(quantile(latencies, 0.95) * 1000, 2),
+    }
+
+# the stages import what they use themselves, so each child process only pays for its own stage
+
+def fixture_pages(args):
+    from benchmarks.servers import load_pages
+    return load_pages(args.fixtures, args.max_fixtures)
+
+def fixture_rows(args):
+    """The fixture pages as scraped rows."""
+    from utils.static_scraper import parse_article_html
+    return [parse_article_html(html) for html in fixture_pages(args)]
+
+def bench_scrape(args):
+    from benchmarks.servers import FixtureServer
+    from utils.crawler import crawl, HostRateLimiter
+    from utils.static_scraper import scrape_asco_article_static
+
+    latencies = []
+    def scrape(url, session):
+        start = time.perf_counter()
+        result = scrape_asco_article_static(url)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    with FixtureServer(latency=args.page_latency, pages=fixture_pages(args)) as server:
+        urls = server.urls(args.pages)
+        start = time.perf_counter()
+        ok = sum(1 for _, result in crawl(urls, scrape, workers=args.workers,
+                                          rate_limiter=HostRateLimiter(min_interval=0, jitter=0)) if result)
+        elapsed = time.perf_counter() - start
+    if ok != len(urls):
+        raise RuntimeError(f"only {ok} of {len(urls)} pages scraped")
+    return summary(len(urls), elapsed, latencies)
+
+def bench_extract(args):
+    from utils.static_scraper import parse_article_html
+
+    pages = fixture_pages(args)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for html in pages:
+            page_start = time.perf_counter()
+            parse_article_html(html)
+            latencies.append(time.perf_counter() - page_start)
+    return summary(len(latencies), time.perf_counter() - start, latencies)
+
+def label_messages(args):
+    """--requests company_id-style prompts built from the fixture pages."""
+    from utils.disclosures import coi_companies
+    from utils.llm import set_repr
+
+    rows = fixture_rows(args)
+    message_lists = []
+    for i in range(args.requests):
+        row = rows[i % len(rows)]
+        message_lists.append([
+            {"role": "system", "content": "You are an expert in medical oncology."},
+            # the request number keeps every prompt distinct, as the article rows are
+            {"role": "user", "content": f"Request {i}. Abstract: {row['abstract']}\n"
+                                        f"List of companies: {set_repr(coi_companies(row['author_disclosures']))}"},
+        ])
+    return message_lists
+
+def company_model():
+    from pydantic import BaseModel
+
+    class Company(BaseModel):
+        product_name: str
+        company_name: str
+        company_in_the_list: bool
+    return Company
+
+def bench_label(args):
+    from benchmarks.servers import MockOpenAI
+    from utils.llm import parse_all
+    from utils.metrics import METRICS
+
+    Company = company_model()
+    message_lists = label_messages(args)
+    with MockOpenAI(latency=args.llm_latency, error_rate=args.llm_error_rate) as server:
+        os.environ['OAI_BASE_URL'] = server.base_url
+        os.environ.setdefault('OAI_API_KEY', 'mock')
+        start = time.perf_counter()
+        results = parse_all(message_lists, Company, concurrency=args.concurrency)
+        elapsed = time.perf_counter() - start
+    if any(result is None for result in results):
+        raise RuntimeError(f"{sum(result is None for result in results)} requests failed")
+    latencies = [value for (name, _), histogram in METRICS.histograms.items()
+                 if name == 'llm_request_seconds' for value in histogram.samples]
+    return summary(len(results), elapsed, latencies)
+
+def bench_batch(args):
+    import tempfile
+    from benchmarks.servers import MockOpenAI, answer_tag
+    from utils.llm_batch import run_batch
+
+    Company = company_model()
+    message_lists = label_messages(args)
+    keys = [f"row-{i}" for i in range(len(message_lists))]
+    with MockOpenAI(error_rate=args.llm_error_rate) as server, tempfile.TemporaryDirectory() as workdir:
+        os.environ['OAI_BASE_URL'] = server.base_url
+        os.environ.setdefault('OAI_API_KEY', 'mock')
+        # run_batch writes its input file to data/ under the working directory
+        os.makedirs(os.path.join(workdir, 'data'))
+        os.chdir(workdir)
+        start = time.perf_counter()
+        results = run_batch(keys, message_lists, Company, name='bench', poll_interval=0)
+        elapsed = time.perf_counter() - start
+        os.chdir(ROOT)
+    failed = sum(result is None for result in results)
+    misrouted = sum(result is not None and result.company_name != answer_tag(messages)
+                    for result, messages in zip(results, message_lists))
+    if misrouted or failed > len(results) * args.llm_error_rate * 2 + 5:
+        raise RuntimeError(f"{misrouted} results came back to the wrong request, {failed} missing")
+    return summary(len(results) - failed, elapsed, [])
+
+def bench_features(args):
+    import pandas as pd
+    from utils.asco_web_scraper import to_csv_row
+    from utils.coi_features import build_analysis_dataset
+    from utils.disclosures import coi_companies
+
+    fixtures = fixture_rows(args)
+    rows = []
+    for row in (fixtures * (args.articles // len(fixtures) + 1))[:args.articles]:
+        companies = sorted(coi_companies(row['author_disclosures']))
+        rows.append(dict(to_csv_row(row), product_name='X', company_name=companies[0] if companies else 'N/A',
+                         company_in_the_list=bool(companies), company_name_variants=companies[:1]))
+    df = pd.DataFrame(rows)
+
+    latencies = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        build_analysis_dataset(df)
+        latencies.append(time.perf_counter() - start)
+    return summary(len(df) * args.repeat, sum(latencies), latencies)
+
+def run_child(stage, args):
+    """Run one stage in this process and print its results as JSON."""
+    result = globals()[f'bench_{stage}'](args)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    print(json.dumps(result))
+
+def run_stage(stage, argv):
+    """Run a stage in a fresh process, so its peak RSS is its own."""
+    completed = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pipeline', '--child', stage] + argv,
+                               cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(result, baseline, tolerance):
+    """Regressions of `result` against `baseline` beyond `tolerance` (a fraction)."""
+    regressions = []
+    if result['throughput'] < baseline['throughput'] * (1 - tolerance):
+        regressions.append('throughput')
+    for key in ('p95_ms', 'peak_rss_mb'):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(key)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages offline and compare with a baseline")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--fixtures', default=os.path.join(ROOT, 'benchmarks', 'fixtures'),
+                        help="directory of .html pages or an HTML archive to use as article pages (default: the synthetic fixtures)")
+    parser.add_argument('--max-fixtures', type=int, default=200, help="at most this many pages of --fixtures are loaded")
+    parser.add_argument('--pages', type=int, default=120, help="pages to crawl in the scrape stage")
+    parser.add_argument('--workers', type=int, default=4, help="crawler threads in the scrape stage")
+    parser.add_argument('--page-latency', type=float, default=0.05, help="seconds the fixture server waits before each page")
+    parser.add_argument('--requests', type=int, default=200, help="LLM requests in the label and batch stages")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests in flight in the label stage")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="seconds the mock OpenAI endpoint takes per request")
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help="share of mock requests (and batch lines) answered with a 429")
+    parser.add_argument('--articles', type=int, default=3000, help="articles in the features stage")
+    parser.add_argument('--repeat', type=int, default=5, help="passes over the pages (extract) or the table (features)")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline results to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown/growth before a stage counts as a regression")
+    parser.add_argument('--child', choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args)
+        sys.exit(0)
+
+    # the children get the same workload options
+    argv = [arg for arg in sys.argv[1:] if arg != '--save-baseline']
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {}
+    failed = []
+    print(f"{'stage':10} {'items':>7} {'items/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'peak MB':>8}  vs baseline")
+    for stage in args.stages:
+        try:
+            result = run_stage(stage, argv)
+        except RuntimeError as e:
+            print(f"{stage:10} failed: {str(e)}")
+            failed.append(stage)
+            continue
+        results[stage] = result
+        note = ''
+        if stage in baseline:
+            regressions = compare(result, baseline[stage], args.tolerance)
+            note = f"{result['throughput'] / max(baseline[stage]['throughput'], 1e-9):.2f}x throughput"
+            if regressions:
+                note += f", REGRESSED: {', '.join(regressions)}"
+                failed.append(stage)
+        print(f"{stage:10} {result['items']:>7} {result['throughput']:>10.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['peak_rss_mb']:>8.1f}  {note}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(dict(baseline, **results), file, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+    sys.exit(1 if failed else 0)
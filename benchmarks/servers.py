@@ -0,0 +1,242 @@
+"""
+Local stand-ins for the two network services the pipeline talks to, for offline benchmarks:
+
+- FixtureServer serves article pages under /doi/10.1200/JCO.bench.<n> URLs, cycling
+  through them, after a configurable delay. By default these are the pages in
+  benchmarks/fixtures, which are small synthetic pages written to cover the disclosure
+  layouts the extractor handles, not saved JCO pages; pass a directory of saved .html
+  pages or an HTML archive (data/html_archive) to serve real pages instead.
+- MockOpenAI answers /v1/chat/completions with a schema-shaped structured-output
+  response after a configurable delay, and can return a share of 429s to exercise retries.
+  It also implements the Batch API calls utils.llm_batch makes (file upload, batch
+  create and retrieve, file content): a batch is answered line by line when it is
+  created, in shuffled order, and is complete at the first retrieve. String fields of every answer carry a
+  tag of the request's last message (answer_tag), so callers can check that results
+  come back to the right request.
+
+Both run in a daemon thread on an ephemeral port; use them as context managers.
+"""
+
+import email
+import glob
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# synthetic pages, see above
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_pages(source=FIXTURES, limit=None):
+    """
+    HTML of the pages in `source`: a directory of .html files or an HTML archive
+    written by utils.html_archive (at most `limit` pages).
+    """
+    if os.path.exists(os.path.join(source, 'index.sqlite')):
+        from utils.html_archive import HtmlArchive, read_page
+        archive = HtmlArchive(source)
+        paths = [archive.path(digest) for _, _, digest in archive.pages()]
+        archive.close()
+        pages = [read_page(path) for path in paths[:limit] if path is not None]
+    else:
+        paths = sorted(glob.glob(os.path.join(source, '*.html')))[:limit]
+        pages = [open(path, encoding='utf-8').read() for path in paths]
+    if not pages:
+        raise ValueError(f"no pages in {source}")
+    return pages
+
+
+class _Server:
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FixtureServer(_Server):
+    def __init__(self, latency=0.0, pages=None):
+        pages = [page.encode('utf-8') for page in (pages if pages is not None else load_pages())]
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(latency)
+                try:
+                    page = pages[int(self.path.rsplit('.', 1)[-1]) % len(pages)]
+                except ValueError:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+        super().__init__(Handler)
+        self.pages = pages
+
+    def urls(self, n):
+        return [f"{self.url}/doi/10.1200/JCO.bench.{i}" for i in range(n)]
+
+
+def answer_tag(messages):
+    """The string MockOpenAI puts in every string field of its answer to `messages`."""
+    return 'X-' + hashlib.sha1(messages[-1]['content'].encode('utf-8')).hexdigest()[:8]
+
+def _sample(schema, definitions, tag='X'):
+    """A minimal value matching a JSON schema: `tag` for strings, True, 0, [] and nested objects."""
+    if '$ref' in schema:
+        return _sample(definitions[schema['$ref'].rsplit('/', 1)[-1]], definitions, tag)
+    kind = schema.get('type')
+    if kind == 'object':
+        return {name: _sample(value, definitions, tag) for name, value in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return []
+    if kind == 'boolean':
+        return True
+    if kind in ('integer', 'number'):
+        return 0
+    return tag
+
+def _completion(request):
+    """The chat.completion body for one structured-output request."""
+    schema = request['response_format']['json_schema']['schema']
+    content = json.dumps(_sample(schema, schema.get('$defs', {}), answer_tag(request['messages'])))
+    prompt_tokens = sum(len(message['content']) for message in request['messages']) // 4
+    return {
+        'id': 'mock', 'object': 'chat.completion', 'created': int(time.time()), 'model': request['model'],
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                  'total_tokens': prompt_tokens + len(content) // 4},
+    }
+
+
+class MockOpenAI(_Server):
+    def __init__(self, latency=0.05, error_rate=0.0):
+        files = {}  # file id -> (filename, purpose, content)
+        batches = {}  # batch id -> batch object
+        ids = itertools.count(1)
+        lock = threading.Lock()
+
+        def new_id(prefix):
+            with lock:
+                return f"{prefix}-mock-{next(ids)}"
+
+        def add_file(filename, purpose, content):
+            file_id = new_id('file')
+            files[file_id] = (filename, purpose, content)
+            return {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                    'filename': filename, 'purpose': purpose, 'status': 'processed'}
+
+        def run_batch(request):
+            """Answer every line of the input file; a share of them fail with a 429, like the live API's error lines."""
+            lines = [json.loads(line) for line in files[request['input_file_id']][2].decode('utf-8').splitlines() if line.strip()]
+            output = []
+            failed = 0
+            for line in lines:
+                if random.random() < error_rate:
+                    failed += 1
+                    response = {'status_code': 429, 'request_id': new_id('req'),
+                                'body': {'error': {'message': 'rate limited (mock)'}}}
+                else:
+                    response = {'status_code': 200, 'request_id': new_id('req'), 'body': _completion(line['body'])}
+                output.append(json.dumps({'id': new_id('batch_req'), 'custom_id': line['custom_id'],
+                                          'response': response, 'error': None}))
+            # the live API does not keep the input order either; results must be joined by custom_id
+            random.shuffle(output)
+            output_file = add_file('batch_output.jsonl', 'batch_output', ('\n'.join(output) + '\n').encode('utf-8'))
+            now = int(time.time())
+            return {
+                'id': new_id('batch'), 'object': 'batch', 'endpoint': request['endpoint'], 'errors': None,
+                'input_file_id': request['input_file_id'], 'completion_window': request['completion_window'],
+                'status': 'completed', 'output_file_id': output_file['id'], 'error_file_id': None,
+                'created_at': now, 'in_progress_at': now, 'finalizing_at': now, 'completed_at': now,
+                'request_counts': {'total': len(lines), 'completed': len(lines) - failed, 'failed': failed},
+                'metadata': request.get('metadata'),
+            }
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, code, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers['Content-Length']))
+
+            def _upload(self):
+                # multipart/form-data with a 'file' and a 'purpose' part
+                message = email.message_from_bytes(
+                    b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + self._body())
+                parts = {part.get_param('name', header='content-disposition'): part for part in message.get_payload()}
+                upload = parts['file']
+                purpose = parts['purpose'].get_payload(decode=True).decode()
+                self._json(200, add_file(upload.get_filename(), purpose, upload.get_payload(decode=True)))
+
+            def do_POST(self):
+                if self.path.endswith('/files'):
+                    self._upload()
+                    return
+                request = json.loads(self._body())
+                if self.path.endswith('/batches'):
+                    if request['input_file_id'] not in files:
+                        self._json(404, {'error': {'message': f"no file {request['input_file_id']}"}})
+                        return
+                    batch = run_batch(request)
+                    batches[batch['id']] = batch
+                    self._json(200, batch)
+                    return
+                if random.random() < error_rate:
+                    self._json(429, {'error': {'message': 'rate limited (mock)'}}, [('retry-after', '0')])
+                    return
+                time.sleep(latency)
+                self._json(200, _completion(request))
+
+            def do_GET(self):
+                parts = self.path.split('?')[0].rstrip('/').split('/')
+                if parts[-2] == 'batches' and parts[-1] in batches:
+                    self._json(200, batches[parts[-1]])
+                elif parts[-1] == 'content' and parts[-2] in files:
+                    content = files[parts[-2]][2]
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                else:
+                    self._json(404, {'error': {'message': f"unknown path {self.path}"}})
+
+        super().__init__(Handler)
+
+    @property
+    def base_url(self):
+        return self.url + '/v1'
@@ -1,67 +1,220 @@
 # A company can have multiple forms of name, such as Eli Lilly/Lilly, etc.
 # This script use LLM to identify all the forms of name for a company for an entity
+# By default the forms are resolved once per company across the whole corpus (see utils/company_aliases.py)
 
 # use OpenAI structured output to identify the pharma/biotech company based on the abstract
 
 from pydantic import BaseModel
-from dotenv import load_dotenv
+import argparse
 import os
-from openai import OpenAI
-import pandas as pd
+from collections import Counter, defaultdict
 from datetime import datetime
-import ast
+from utils.llm import MODEL, parse_all, set_repr
+from utils.llm_cache import LLMCache
+from utils.llm_batch import run_batch
+from utils.disclosures import parse_disclosures, coi_companies
+from utils.incremental import new_rows, merge_rows, normalize_doi, output_dois
+from utils.dataset import load, save, iter_batches, TableAppender
+from utils.matcher import VariantMatcher
+from utils.companies import is_company
+from utils.company_aliases import AliasTable, Canonicalizer
+from utils.metrics import configure, inc, report
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv('OAI_API_KEY'))
+parser = argparse.ArgumentParser(description="Find the name variants of each article's company in its COI disclosures")
+parser.add_argument('--concurrency', type=int, default=8, help="maximum number of requests in flight")
+parser.add_argument('--rpm', type=int, default=None, help="requests-per-minute budget (default: follow the API's limits)")
+parser.add_argument('--tpm', type=int, default=None, help="tokens-per-minute budget (default: follow the API's limits)")
+parser.add_argument('--batch', action='store_true', help="submit all requests as one OpenAI Batch API job")
+parser.add_argument('--batch-id', help="resume waiting for a previously submitted batch")
+parser.add_argument('--poll-interval', type=int, default=60, help="seconds between batch status checks")
+parser.add_argument('--no-cache', action='store_true', help="always call the API, ignoring data/llm_cache.sqlite")
+parser.add_argument('--clear-cache', action='store_true', help="empty the response cache before running")
+parser.add_argument('--cache-max-age-days', type=float, default=90, help="evict cached responses not used for this many days (default 90, 0: keep them all)")
+parser.add_argument('--cache-max-entries', type=int, help="keep at most this many cached responses, evicting the least recently used")
+parser.add_argument('--per-article', action='store_true', help="ask the LLM about every article's COI list separately instead of using the corpus-level alias table")
+parser.add_argument('--aliases', default='data/company_aliases.csv', help="persistent company alias table")
+parser.add_argument('--input', default='results/asco_articles_with_company_human_edited.csv', help="articles with their (reviewed) company names (CSV or Parquet)")
+parser.add_argument('--update', help="previous output of this script; only articles it has no result for are sent to the LLM, and they are merged into it")
+parser.add_argument('--output', help="table to write (.parquet or .csv; default: timestamped CSV and Parquet files in results/)")
+parser.add_argument('--chunk-size', type=int, help="stream the input in chunks of this many rows and append each processed chunk to the CSV --output (default: results/asco_articles_with_company_name_variants_stream.csv); rerunning resumes where it stopped")
+parser.add_argument('--fsync-interval', type=float, default=10.0, help="with --chunk-size, seconds between fsyncs of the output")
+parser.add_argument('--metrics', default='data/metrics/company_clean_name', help="metrics file prefix: appends <prefix>.jsonl and rewrites <prefix>.prom")
+args = parser.parse_args()
+if args.chunk_size and (args.update or args.batch or args.batch_id):
+    parser.error("--chunk-size resumes from its own --output and sends requests directly; it cannot be combined with --update or --batch")
+if args.chunk_size and args.output and args.output.endswith('.parquet'):
+    parser.error("--chunk-size appends to its output, which must be a CSV")
+configure(args.metrics)
 
-asco_articles_with_company = pd.read_csv('results/asco_articles_with_company_human_edited.csv')
-asco_articles_with_company['company_name_variants'] = None
+cache = None if args.no_cache else LLMCache(max_age_days=args.cache_max_age_days or None,
+                                            max_entries=args.cache_max_entries)
+if cache is not None and args.clear_cache:
+    cache.clear()
+
+previous = None
+if args.chunk_size:
+    # nothing is loaded up front; articles whose DOI the output already holds are skipped chunk by chunk
+    # a fixed default, so rerunning the same command picks up the same file
+    output = args.output or 'results/asco_articles_with_company_name_variants_stream.csv'
+    done = output_dois(output)
+    print(f"Streaming {args.input} in chunks of {args.chunk_size} rows to {output}; {len(done)} articles already there")
+else:
+    asco_articles_with_company = load(args.input)
+    asco_articles_with_company['company_name_variants'] = None
+    if args.update and not os.path.exists(args.update):
+        print(f"No previous output at {args.update} yet; all articles will be processed")
+    elif args.update:
+        # look up variants only for the articles (by DOI) that the previous output has none for
+        previous = load(args.update)
+        asco_articles_with_company = new_rows(asco_articles_with_company, previous, 'company_name_variants')
+        print(f"{len(asco_articles_with_company)} articles to process, {len(previous)} already in {args.update}")
 
 class CompanyNameVariants(BaseModel):
     company_name_variants: list[str]
 
-for index, study in asco_articles_with_company.iterrows():
-    
-    company_name = study['company_name']
-    coi_company = set()
-
-    # Parse the string to list of dictionaries using ast.literal_eval
-    try:
-        disclosures = ast.literal_eval(study['author_disclosures'])
-    except (ValueError, SyntaxError) as e:
-        print(f"Warning: Could not parse author disclosures for row {index}")
-        print(f"Error details: {str(e)}")
-        continue
-
-    for disclosure in disclosures:
-        if disclosure['Author'] == 'None':
-            continue
-            
-        for disc in disclosure['Disclosures']:
-            # Remove the category label (everything before the colon)
-            if ':' in disc:
-                disc = disc.split(':', 1)[1]
-                
-            # Split on commas and add to set
-            companies = [c.strip().replace('(Inst)', '').strip() for c in disc.split(',')]
-            coi_company.update(c for c in companies if c and c != 'No other potential conflicts of interest were reported.')
-
-    completion = client.beta.chat.completions.parse(
-        model="gpt-4o-2024-11-20",
-        messages=[
-            {"role": "system", "content": "You are an expert in medical oncology."},
-            {"role": "user", "content": f'''You are given a company name. You are then provided with a list of biotech/pharma companies which may or may not contain this company. If the list includes this company, please identify all the forms of name for this company in the list, and return them.
+def variants_prompt(company_name, companies):
+    return [
+        {"role": "system", "content": "You are an expert in medical oncology."},
+        {"role": "user", "content": f'''You are given a company name. You are then provided with a list of biotech/pharma companies which may or may not contain this company. If the list includes this company, please identify all the forms of name for this company in the list, and return them.
             The company name: {company_name} 
-            List of companies: {coi_company}'''},
-        ],
-        response_format=CompanyNameVariants,
-    )
-    company_output = completion.choices[0].message.parsed
-    # print(coi_company)
-    print(company_output)
-    # Use loc instead of at for setting values
-    asco_articles_with_company.loc[index, 'company_name_variants'] = str(company_output.company_name_variants)
-
-# save results based on current time stamp
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-asco_articles_with_company.to_csv(f'results/asco_articles_with_company_name_variants_{timestamp}.csv', index=False)
+            List of companies: {set_repr(companies)}'''},
+    ]
+
+def ask(keys, message_lists, name):
+    if args.batch or args.batch_id:
+        # one bulk job instead of many synchronous calls; results are joined back by key
+        return run_batch(keys, message_lists, CompanyNameVariants, name=name, batch_id=args.batch_id, model=MODEL,
+                         cache=cache, poll_interval=args.poll_interval)
+    # send all requests concurrently; results come back in the same order as the requests
+    return parse_all(message_lists, CompanyNameVariants, concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm, model=MODEL, cache=cache)
+
+def collect_articles(asco_articles_with_company):
+    """(index, company name, COI companies) of every row whose disclosures parse."""
+    articles = []
+    for index, study in asco_articles_with_company.iterrows():
+        
+        company_name = study['company_name']
+
+        try:
+            disclosures = parse_disclosures(study['author_disclosures'])
+        except (ValueError, SyntaxError) as e:
+            print(f"Warning: Could not parse author disclosures for row {index}")
+            print(f"Error details: {str(e)}")
+            continue
+        articles.append((index, company_name, coi_companies(disclosures)))
+    return articles
+
+def label_per_article(asco_articles_with_company, articles):
+    indices = [index for index, _, _ in articles]
+    results = ask(indices, [variants_prompt(company_name, coi_company) for _, company_name, coi_company in articles],
+                  'company_clean_name')
+
+    for (index, _, coi_company), company_output in zip(articles, results):
+        if company_output is None:
+            print(f"Warning: No result for row {index}")
+            continue
+        print(company_output)
+        asco_articles_with_company.at[index, 'company_name_variants'] = company_output.company_name_variants
+
+        # the variants should come from the article's own COI list; flag any that never occur in it
+        coi_list = '\n'.join(sorted(coi_company))
+        found = VariantMatcher(company_output.company_name_variants).find_all(coi_list)
+        missing = [variant for variant in company_output.company_name_variants if variant and variant not in found]
+        if missing:
+            print(f"Warning: Variants not found in the COI list of row {index}: {missing}")
+
+def count_cooccurring(cooccurring, articles):
+    """Add the COI names of `articles` to the per-company counts in `cooccurring`."""
+    for _, company_name, coi_company in articles:
+        if is_company(company_name):
+            cooccurring[company_name].update(coi_company)
+
+def resolve_aliases(cooccurring, n_articles):
+    """
+    Resolve every company once across the corpus, from the COI names counted per
+    company over its articles; returns the updated alias table.
+    """
+    canonicalizer = Canonicalizer(set().union(*cooccurring.values()), cooccurring)
+    aliases = AliasTable(args.aliases)
+    companies = sorted(cooccurring)
+    questions = canonicalizer.questions(companies, aliases)
+    inc('alias_companies_total', len(questions), result='llm')
+    inc('alias_companies_total', len(companies) - len(questions), result='local')
+    print(f"Aliases: {len(canonicalizer.names)} distinct COI names in {len(canonicalizer.clusters)} keys; "
+          f"{len(questions)} of {len(companies)} companies need the LLM ({n_articles} articles)")
+
+    results = ask(list(range(len(questions))), [variants_prompt(company_name, unresolved) for company_name, unresolved in questions],
+                  'company_aliases')
+    for (company_name, unresolved), company_output in zip(questions, results):
+        if company_output is None:
+            # left undecided, so the next run asks again
+            print(f"Warning: No result for {company_name}")
+            continue
+        accepted = unresolved & set(company_output.company_name_variants)
+        aliases.add(company_name, accepted, True, 'llm')
+        aliases.add(company_name, unresolved - accepted, False, 'llm')
+    aliases.save()
+    return aliases
+
+def label_from_aliases(asco_articles_with_company, articles, aliases):
+    for index, company_name, coi_company in articles:
+        asco_articles_with_company.at[index, 'company_name_variants'] = (
+            aliases.variants(company_name, coi_company) if is_company(company_name) else [])
+
+def pending_chunks(columns=None):
+    """The input in chunks of --chunk-size rows, without the articles the output already holds."""
+    for chunk in iter_batches(args.input, columns=columns, batch_size=args.chunk_size):
+        chunk = chunk[~chunk['doi'].map(normalize_doi).isin(done)]
+        if len(chunk):
+            yield chunk
+
+if args.chunk_size:
+    aliases = None
+    if not args.per_article:
+        # first pass over just the columns the alias table needs, so the whole corpus is never in memory
+        cooccurring, n_articles = defaultdict(Counter), 0
+        for chunk in pending_chunks(['doi', 'company_name', 'author_disclosures']):
+            articles = collect_articles(chunk)
+            count_cooccurring(cooccurring, articles)
+            n_articles += len(articles)
+        aliases = resolve_aliases(cooccurring, n_articles)
+
+    # second pass: label each chunk and append it to the output as soon as it is done
+    with TableAppender(output, fsync_interval=args.fsync_interval) as appender:
+        for chunk in pending_chunks():
+            chunk = chunk.assign(company_name_variants=None)
+            articles = collect_articles(chunk)
+            if args.per_article:
+                label_per_article(chunk, articles)
+            else:
+                label_from_aliases(chunk, articles, aliases)
+            # rows without a result are left out, so the next run tries them again
+            processed = chunk['company_name_variants'].notna()
+            appender.append(chunk[processed])
+            print(f"Appended {appender.rows} rows to {output}, {(~processed).sum()} left for the next run")
+else:
+    articles = collect_articles(asco_articles_with_company)
+    if args.per_article:
+        label_per_article(asco_articles_with_company, articles)
+    else:
+        cooccurring = defaultdict(Counter)
+        count_cooccurring(cooccurring, articles)
+        aliases = resolve_aliases(cooccurring, len(articles))
+        label_from_aliases(asco_articles_with_company, articles, aliases)
+if cache is not None:
+    print(f"Cache: {cache.stats()}")
+
+if previous is not None:
+    asco_articles_with_company = merge_rows(previous, asco_articles_with_company)
+
+if args.chunk_size:
+    print(f"Articles with their name variants are in {output}")
+elif args.output:
+    save(asco_articles_with_company, args.output)
+else:
+    # save results based on current time stamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # CSV for manual review, typed Parquet for the later stages
+    save(asco_articles_with_company, f'results/asco_articles_with_company_name_variants_{timestamp}.csv')
+    save(asco_articles_with_company, f'results/asco_articles_with_company_name_variants_{timestamp}.parquet')
+print(report())
@@ -1,68 +1,200 @@
 # use OpenAI structured output to identify the pharma/biotech company based on the abstract
 
 from pydantic import BaseModel
-from dotenv import load_dotenv
+import argparse
 import os
-from openai import OpenAI
-import pandas as pd
 from datetime import datetime
-import ast
+from utils.llm import MODEL, parse_all, set_repr, count_tokens
+from utils.llm_cache import LLMCache
+from utils.llm_batch import run_batch
+from utils.disclosures import parse_disclosures, coi_companies
+from utils.incremental import new_rows, merge_rows, normalize_doi, output_dois
+from utils.dataset import load, save, iter_batches, TableAppender
+from utils.product_resolver import ProductResolver
+from utils.company_list import compact_company_list
+from utils.metrics import configure, inc, report
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv('OAI_API_KEY'))
+parser = argparse.ArgumentParser(description="Identify the studied product and its manufacturer for each article")
+parser.add_argument('--concurrency', type=int, default=8, help="maximum number of requests in flight")
+parser.add_argument('--rpm', type=int, default=None, help="requests-per-minute budget (default: follow the API's limits)")
+parser.add_argument('--tpm', type=int, default=None, help="tokens-per-minute budget (default: follow the API's limits)")
+parser.add_argument('--batch', action='store_true', help="submit all requests as one OpenAI Batch API job")
+parser.add_argument('--batch-id', help="resume waiting for a previously submitted batch")
+parser.add_argument('--poll-interval', type=int, default=60, help="seconds between batch status checks")
+parser.add_argument('--no-cache', action='store_true', help="always call the API, ignoring data/llm_cache.sqlite")
+parser.add_argument('--clear-cache', action='store_true', help="empty the response cache before running")
+parser.add_argument('--cache-max-age-days', type=float, default=90, help="evict cached responses not used for this many days (default 90, 0: keep them all)")
+parser.add_argument('--cache-max-entries', type=int, help="keep at most this many cached responses, evicting the least recently used")
+parser.add_argument('--no-resolver', action='store_true', help="send every article to the LLM, skipping the local product lookup")
+parser.add_argument('--resolver-min-count', type=int, default=3, help="earlier articles a product needs before it is answered locally")
+parser.add_argument('--max-list-tokens', type=int, default=0, help="token budget for the company list in each prompt (default 0: no limit; a budget may cut the manufacturer)")
+parser.add_argument('--full-list', action='store_true', help="send every COI company as-is, without deduplication, filtering or the token budget")
+parser.add_argument('--input', default='data/asco_articles.csv', help="articles to label (CSV or Parquet)")
+parser.add_argument('--update', help="previous output of this script; only articles it has no result for are sent to the LLM, and they are merged into it")
+parser.add_argument('--output', help="table to write (.parquet or .csv; default: timestamped CSV and Parquet files in results/)")
+parser.add_argument('--chunk-size', type=int, help="stream the input in chunks of this many rows and append each labelled chunk to the CSV --output (default: results/asco_articles_with_company_stream.csv); rerunning resumes where it stopped")
+parser.add_argument('--fsync-interval', type=float, default=10.0, help="with --chunk-size, seconds between fsyncs of the output")
+parser.add_argument('--metrics', default='data/metrics/company_id', help="metrics file prefix: appends <prefix>.jsonl and rewrites <prefix>.prom")
+args = parser.parse_args()
+if args.chunk_size and (args.update or args.batch or args.batch_id):
+    parser.error("--chunk-size resumes from its own --output and sends requests directly; it cannot be combined with --update or --batch")
+if args.chunk_size and args.output and args.output.endswith('.parquet'):
+    parser.error("--chunk-size appends to its output, which must be a CSV")
+configure(args.metrics)
 
-asco_articles = pd.read_csv('data/asco_articles.csv')
+cache = None if args.no_cache else LLMCache(max_age_days=args.cache_max_age_days or None,
+                                            max_entries=args.cache_max_entries)
+if cache is not None and args.clear_cache:
+    cache.clear()
+
+previous = None
+if args.chunk_size:
+    # nothing is loaded up front; articles whose DOI the output already holds are skipped chunk by chunk
+    # a fixed default, so rerunning the same command picks up the same file
+    output = args.output or 'results/asco_articles_with_company_stream.csv'
+    done = output_dois(output)
+    print(f"Streaming {args.input} in chunks of {args.chunk_size} rows to {output}; {len(done)} articles already there")
+else:
+    asco_articles = load(args.input)
+    if args.update and not os.path.exists(args.update):
+        print(f"No previous output at {args.update} yet; all articles will be processed")
+    elif args.update:
+        # label only the articles (by DOI) that the previous output has no company for
+        previous = load(args.update)
+        asco_articles = new_rows(asco_articles, previous, 'company_name')
+        print(f"{len(asco_articles)} articles to label, {len(previous)} already in {args.update}")
 
 class Company(BaseModel):
     product_name: str
     company_name: str
     company_in_the_list: bool
 
-for index, study in asco_articles.iterrows():
-    abstract = study['abstract']
-    year = study['publication_date']
-    coi_company = set()
-
-    # Parse the string to list of dictionaries using ast.literal_eval
-    try:
-        disclosures = ast.literal_eval(study['author_disclosures'])
-    except (ValueError, SyntaxError) as e:
-        print(f"Warning: Could not parse author disclosures for row {index}")
-        print(f"Error details: {str(e)}")
-        continue
-
-    for disclosure in disclosures:
-        if disclosure['Author'] == 'None':
-            continue
-            
-        for disc in disclosure['Disclosures']:
-            # Remove the category label (everything before the colon)
-            if ':' in disc:
-                disc = disc.split(':', 1)[1]
-                
-            # Split on commas and add to set
-            companies = [c.strip().replace('(Inst)', '').strip() for c in disc.split(',')]
-            coi_company.update(c for c in companies if c and c != 'No other potential conflicts of interest were reported.')
-
-    completion = client.beta.chat.completions.parse(
-        model="gpt-4o-2024-11-20",
-        messages=[
-            {"role": "system", "content": "You are an expert in medical oncology."},
-            {"role": "user", "content": f'''You are provided with an abstract of a study, identify the medical product (e.g. drug, device) that is being studied and return the generic name(e.g. imatinib). If the study is not about a medical product, return 'N/A'. If multiple products are studied, focus on the primary one. 
+def company_prompt(abstract, year, companies):
+    return [
+        {"role": "system", "content": "You are an expert in medical oncology."},
+        {"role": "user", "content": f'''You are provided with an abstract of a study, identify the medical product (e.g. drug, device) that is being studied and return the generic name(e.g. imatinib). If the study is not about a medical product, return 'N/A'. If multiple products are studied, focus on the primary one. 
             Next, a list of commercial company names is provided, which may or may not contain the company that produces the product being studied. Based on your own knowledge, return the name of the commercial company (usally a pharma/biotech/manufacturing company) that produces this product exclusively at the time of the study publication. If multiple companies can produce the same product, which usually happens in the case of a none-proprietary drug, return 'N/A' for the company name. If you are not sure about the company name, return 'unsure'.
             The abstract: {abstract} 
             Publication time: {str(year)}
-            List of companies: {coi_company}'''},
-        ],
-        response_format=Company,
-    )
-    company_output = completion.choices[0].message.parsed
-    # print(coi_company)
-    print(company_output)
-    asco_articles.at[index, 'product_name'] = company_output.product_name
-    asco_articles.at[index, 'company_name'] = company_output.company_name
-    asco_articles.at[index, 'company_in_the_list'] = company_output.company_in_the_list
-
-# save results based on current time stamp
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-asco_articles.to_csv(f'results/asco_articles_with_company_{timestamp}.csv', index=False)
+            List of companies: {set_repr(companies)}'''},
+    ]
+
+# well-known products are answered from earlier results/ without calling the LLM
+resolver = None if args.no_resolver else ProductResolver.from_results('results', min_count=args.resolver_min_count)
+if resolver is not None:
+    print(f"Resolver: {len(resolver.table)} known products")
+
+# totals over all chunks
+prompt_tokens = [0, 0]  # before and after compaction
+n_resolved = 0
+n_requested = 0
+
+def label_articles(asco_articles):
+    """Fill product_name, company_name and company_in_the_list for the rows of `asco_articles`."""
+    global n_resolved, n_requested
+    resolved = {}
+    indices = []
+    message_lists = []
+    for index, study in asco_articles.iterrows():
+        abstract = study['abstract']
+        year = study['publication_date']
+
+        try:
+            disclosures = parse_disclosures(study['author_disclosures'])
+        except (ValueError, SyntaxError) as e:
+            print(f"Warning: Could not parse author disclosures for row {index}")
+            print(f"Error details: {str(e)}")
+            continue
+        coi_company = coi_companies(disclosures)
+
+        answer = resolver.resolve(study['title'], abstract, coi_company) if resolver is not None else None
+        if answer is not None:
+            product_name, company_name, company_in_the_list = answer
+            resolved[index] = Company(product_name=product_name, company_name=company_name,
+                                      company_in_the_list=company_in_the_list)
+            inc('resolver_lookups_total', result='hit')
+            continue
+        if resolver is not None:
+            inc('resolver_lookups_total', result='miss')
+
+        messages = company_prompt(abstract, year, coi_company)
+        if not args.full_list:
+            # deduplicated, commercial-only list within the token budget; log the saving per request
+            tokens_before = count_tokens(messages[1]['content'], MODEL)
+            # the known makers of the products the article names survive any token budget
+            makers = resolver.makers(f"{study['title']}\n{abstract}") if resolver is not None else ()
+            messages = company_prompt(abstract, year, compact_company_list(disclosures, args.max_list_tokens or None, MODEL,
+                                                                           makers=makers))
+            tokens_after = count_tokens(messages[1]['content'], MODEL)
+            print(f"Row {index}: prompt tokens {tokens_before} -> {tokens_after}")
+            prompt_tokens[0] += tokens_before
+            prompt_tokens[1] += tokens_after
+            inc('prompt_list_tokens_total', tokens_before, stage='before')
+            inc('prompt_list_tokens_total', tokens_after, stage='after')
+
+        indices.append(index)
+        message_lists.append(messages)
+
+    if args.batch or args.batch_id:
+        # one bulk job instead of many synchronous calls; results are joined back by row index
+        results = run_batch(indices, message_lists, Company, name='company_id', batch_id=args.batch_id, model=MODEL,
+                            cache=cache, poll_interval=args.poll_interval)
+    else:
+        # send all requests concurrently; results come back in the same order as the rows
+        results = parse_all(message_lists, Company, concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm, model=MODEL, cache=cache)
+    n_resolved += len(resolved)
+    n_requested += len(indices)
+
+    answers = [(index, company_output, 'llm') for index, company_output in zip(indices, results)]
+    answers += [(index, company_output, 'resolver') for index, company_output in resolved.items()]
+    for index, company_output, source in answers:
+        if company_output is None:
+            print(f"Warning: No result for row {index}")
+            continue
+        print(company_output)
+        asco_articles.at[index, 'product_name'] = company_output.product_name
+        asco_articles.at[index, 'company_name'] = company_output.company_name
+        asco_articles.at[index, 'company_in_the_list'] = company_output.company_in_the_list
+        # the resolver only learns from answers that did not come from itself
+        asco_articles.at[index, 'company_source'] = source
+    return asco_articles
+
+if args.chunk_size:
+    # stream the input in bounded chunks and append each labelled chunk to the output as it is done
+    with TableAppender(output, fsync_interval=args.fsync_interval) as appender:
+        for chunk in iter_batches(args.input, batch_size=args.chunk_size):
+            chunk = chunk[~chunk['doi'].map(normalize_doi).isin(done)]
+            if len(chunk):
+                chunk = label_articles(chunk.assign(product_name=None, company_name=None, company_in_the_list=None,
+                                                    company_source=None))
+                # rows without a result are left out, so the next run tries them again
+                labelled = chunk['company_name'].notna()
+                appender.append(chunk[labelled])
+                print(f"Appended {appender.rows} rows to {output}, {(~labelled).sum()} left for the next run")
+else:
+    asco_articles = label_articles(asco_articles)
+
+if not args.full_list and n_requested:
+    print(f"Prompt tokens: {prompt_tokens[0]} -> {prompt_tokens[1]} "
+          f"({1 - prompt_tokens[1] / max(prompt_tokens[0], 1):.1%} fewer) over {n_requested} requests")
+if cache is not None:
+    print(f"Cache: {cache.stats()}")
+if resolver is not None:
+    total = n_resolved + n_requested
+    print(f"Resolver: answered {n_resolved} of {total} articles locally "
+          f"({n_resolved / max(total, 1):.1%} hit rate), {n_resolved} API calls saved")
+
+if previous is not None:
+    asco_articles = merge_rows(previous, asco_articles)
+
+if args.chunk_size:
+    print(f"Labelled articles are in {output}")
+elif args.output:
+    save(asco_articles, args.output)
+else:
+    # save results based on current time stamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # CSV for manual review, typed Parquet for the later stages
+    save(asco_articles, f'results/asco_articles_with_company_{timestamp}.csv')
+    save(asco_articles, f'results/asco_articles_with_company_{timestamp}.parquet')
+print(report())
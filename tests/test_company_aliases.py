@@ -0,0 +1,44 @@
+from collections import Counter
+from utils.company_aliases import AliasTable, Canonicalizer, MAX_COOCCURRING
+
+def corpus(reverse=False):
+    # more co-occurring names than are asked about per company, with a tie across the cut;
+    # `reverse` counts them in the opposite order, as another process's set order may
+    acme = [(f'Acme{i} Inc', 100 - (i + 1) // 2) for i in range(MAX_COOCCURRING + 15)]
+    cooccurring = {
+        'Merck': Counter(dict(acme[::-1] if reverse else acme)),
+        'Eli Lilly': Counter({'Lilly': 5, 'Lilly Oncology': 3, 'Pfizer': 2}),
+    }
+    cooccurring['Merck'].update({'Merck Sharp & Dohme': 50, 'Merck Serono': 40})
+    return Canonicalizer(set().union(*cooccurring.values()), cooccurring), sorted(cooccurring)
+
+def run(path, accept, reverse=False):
+    """One alias resolution run: returns the questions the LLM was asked."""
+    canonicalizer, companies = corpus(reverse)
+    table = AliasTable(path)
+    questions = canonicalizer.questions(companies, table)
+    for company, unresolved in questions:
+        accepted = {name for name in unresolved if accept(company, name)}
+        table.add(company, accepted, True, 'llm')
+        table.add(company, unresolved - accepted, False, 'llm')
+    table.save()
+    return questions
+
+def test_second_run_on_unchanged_corpus_sends_no_requests(tmp_path):
+    path = str(tmp_path / 'company_aliases.csv')
+    accept = lambda company, name: name.split()[0] in company.split()
+    first = run(path, accept)
+    assert first
+    rows = len(AliasTable(path).rows)
+
+    assert run(path, accept, reverse=True) == []
+    assert len(AliasTable(path).rows) == rows
+
+def test_candidates_keep_the_top_cooccurring_names():
+    canonicalizer, _ = corpus()
+    top = {name for name, _ in canonicalizer.cooccurring['merck'].most_common(MAX_COOCCURRING)}
+    known = set(list(top)[:5])
+    candidates = canonicalizer.candidates('Merck', canonicalizer.local_aliases('Merck'), known)
+    # deciding some of the top names does not pull in names further down the list
+    assert candidates <= top | {'Merck Sharp & Dohme', 'Merck Serono'}
+    assert not candidates & known
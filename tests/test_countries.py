@@ -0,0 +1,20 @@
+import pytest
+from utils.countries import normalize_country
+
+@pytest.mark.parametrize('part, country', [
+    ('Italy', 'Italy'),
+    ('Bologna Italy', 'Italy'),
+    ('Boston MA', 'USA'),
+    ('United States of America', 'USA'),
+    ('Sydney New South Wales', 'Australia'),
+    # a region alias may end a longer part, ahead of the country its last word names
+    ('Northern Ireland', 'United Kingdom'),
+    ('Belfast Northern Ireland', 'United Kingdom'),
+    ('Dublin Ireland', 'Ireland'),
+])
+def test_normalize_country(part, country):
+    assert normalize_country(part) == country
+
+@pytest.mark.parametrize('part', ['New England', 'Latin America', 'Atlanta Georgia'])
+def test_ambiguous_last_words_are_left_as_written(part):
+    assert normalize_country(part) == part
@@ -0,0 +1,32 @@
+import os
+from bs4 import BeautifulSoup
+from utils.static_scraper import is_complete, parse_article_html
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures', 'structured_authors.html')
+
+def page(edit=None):
+    with open(FIXTURE, encoding='utf-8') as file:
+        soup = BeautifulSoup(file.read(), 'html.parser')
+    if edit is not None:
+        edit(soup)
+    return str(soup)
+
+def test_article_is_complete():
+    assert is_complete(parse_article_html(page()))
+
+def test_page_without_abstract_section_is_complete():
+    # editorials, letters and corrections have no abstract; the browser would not find one either
+    result = parse_article_html(page(lambda soup: soup.find(id='abstract').decompose()))
+    assert result['abstract'] == "Abstract not found"
+    assert is_complete(result)
+
+def test_empty_abstract_section_is_incomplete():
+    def empty(soup):
+        soup.find(id='abstract').clear()
+    assert not is_complete(parse_article_html(page(empty)))
+
+def test_page_without_authors_is_incomplete():
+    def drop_authors(soup):
+        for tag in soup.find_all('meta', attrs={'name': 'dc.Creator'}):
+            tag.decompose()
+    assert not is_complete(parse_article_html(page(drop_authors)))
@@ -7,191 +7,270 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+import argparse
 import csv
 import time
+from functools import partial
 import json
 from datetime import datetime
 import re
 from bs4 import BeautifulSoup
-from utils.utils import get_html_from_url
+import pandas as pd
+from utils.utils import get_webdriver
 from utils.utils import extract_author_coi
+from utils.utils import DriverSession
+from utils.crawler import crawl, HostRateLimiter
+from utils.crawl_state import CrawlState
+from utils.static_scraper import scrape_asco_article_static
+from utils.html_archive import HtmlArchive
+from utils.incremental import normalize_doi
+from utils.dataset import load, save, TableAppender
+from utils.metrics import configure, inc, timer, timed, report
+from utils.countries import affiliation_countries
+from utils.page_wait import FIELDS, REQUIRED, WaitTimes, wait_for_fields
 
-def get_webdriver():
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-    
-    try:
-        driver = webdriver.Chrome(options=chrome_options)
-        return driver
-    except Exception as e:
-        print(f"Chrome setup failed: {str(e)}")
-        raise Exception("Failed to initialize Chrome webdriver")
-    
+AFFILIATIONS = 'div.affiliations div[property="affiliation"][typeof="Organization"] span[property="name"]'
+
+# field appearance times shared by all browser workers; main() loads and saves them with --wait-times
+wait_times = WaitTimes()
 
-def extract_countries(driver, wait):
-    countries = list() 
+@timed('extract_countries_seconds')
+def extract_countries(driver):
+    """Canonical country of every author affiliation on the page."""
     try:
-        # Wait for the core-authors section to be present
-        authors_section = wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, "core-authors"))
-        )
-        
-        # More specific CSS selector based on the HTML structure
-        affiliations = authors_section.find_elements(
-            By.CSS_SELECTOR, 
-            'div.affiliations div[property="affiliation"][typeof="Organization"] span[property="name"]'
+        authors_section = driver.find_element(By.CLASS_NAME, "core-authors")
+
+        # the text of all affiliations in one round-trip instead of one execute_script per element
+        texts = driver.execute_script(
+            "return Array.from(arguments[0].querySelectorAll(arguments[1]), el => el.textContent);",
+            authors_section, AFFILIATIONS,
         )
-        
-        for affiliation in affiliations:
-            try:
-                # Get the text using JavaScript to ensure content is loaded
-                text = driver.execute_script("return arguments[0].textContent;", affiliation)
-                
-                if text and "," in text:
-                    # Split by comma and get the last part
-                    parts = [part.strip() for part in text.split(",")]
-                    country = parts[-1]  # Get the last part after comma
-                    if country:
-                        countries.append(country)
-            except Exception as e:
-                continue
-        return list(countries)
+        return affiliation_countries(texts or [])
     except Exception as e:
         return []
 
-def scrape_asco_article(url):
-    driver = get_webdriver()
+def scrape_asco_article(url, session=None):
+    """
+    Scrape one article. Pass a DriverSession to reuse its browser across calls;
+    without one a temporary browser is started and closed for this URL only.
+    """
+    own_session = session is None
+    if own_session:
+        session = DriverSession()
+    driver = session.get()
     
     try:
         print("Navigating to URL...")
-        driver.get(url)
+        with timer('page_load_seconds', fetcher='browser'):
+            driver.get(url)
         
-        # Add an explicit wait with timeout
-        wait = WebDriverWait(driver, 30) 
+        # Wait for all fields at once; missing ones are known as soon as the page settles
         print("Page loaded, waiting for elements...")
-        
-        try:
-            wait.until(lambda d: d.execute_script('return document.readyState') == 'complete')
-
-            # Extract the title
-            title_element = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'meta[name="dc.Title"]'))
-            )
-            title = title_element.get_attribute("content")
-
-            # Extract the authors
-            author_elements = driver.find_elements(By.CSS_SELECTOR, 'meta[name="dc.Creator"]')
-            author_names = [author.get_attribute("content") for author in author_elements]
-            
-            # Extract the DOI
-            doi_element = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'meta[name="dc.Identifier"]'))
-            )
-            doi = doi_element.get_attribute("content")
+        found = wait_for_fields(driver, wait_times)
+        if not all(field in found for field in REQUIRED):
+            return None
 
-            # Extract the abstract
-            try:
-                abstract_section = wait.until(
-                    EC.presence_of_element_located((By.ID, "abstract"))
-                )
-                
-                # First try to find subsections
-                abstract_parts = abstract_section.find_elements(By.TAG_NAME, "section")
-                
-                if abstract_parts:  # Structured abstract with subsections
-                    abstract_text = []
-                    for part in abstract_parts:
-                        try:
-                            section_title = part.find_element(By.TAG_NAME, "h3").text
-                            content = part.find_element(By.CSS_SELECTOR, 'div[role="paragraph"]').text
-                            abstract_text.append(f"{section_title}: {content}")
-                        except NoSuchElementException:
-                            continue
-                    abstract = "\n\n".join(abstract_text)
-                else:  # Unstructured abstract
-                    paragraphs = abstract_section.find_elements(By.CSS_SELECTOR, 'div[role="paragraph"]')
-                    abstract = "\n\n".join(para.text for para in paragraphs)
+        # Extract the title
+        title = driver.find_element(By.CSS_SELECTOR, FIELDS['title']).get_attribute("content")
 
-            except (TimeoutException, NoSuchElementException):
-                abstract = "Abstract not found"
-            
-            # Extract the publication date
-            try:
-                pub_date_element = wait.until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'meta[name="dc.Date"]'))
-                )
-                pub_date = pub_date_element.get_attribute("content")
+        # Extract the authors
+        author_elements = driver.find_elements(By.CSS_SELECTOR, 'meta[name="dc.Creator"]')
+        author_names = [author.get_attribute("content") for author in author_elements]
+        
+        # Extract the DOI
+        doi = driver.find_element(By.CSS_SELECTOR, FIELDS['doi']).get_attribute("content")
 
-            except (TimeoutException, NoSuchElementException):
-                pub_date = "Publication date not found"
+        # Extract the abstract
+        abstract = "Abstract not found"
+        if 'abstract' in found:
+            abstract_section = driver.find_element(By.CSS_SELECTOR, FIELDS['abstract'])
             
-            # Extract authors' disclosures
-            print("Looking for disclosures...")
-            try:
-                html_content = get_html_from_url(url)
-                author_cois = extract_author_coi(html_content)
-            except (TimeoutException, NoSuchElementException):
-                author_cois = {}
+            # First try to find subsections
+            abstract_parts = abstract_section.find_elements(By.TAG_NAME, "section")
             
-            # Extract countries
-            countries = extract_countries(driver, wait)
-            
-            # Return the extracted information
-            return {
-                "title": title,
-                "authors": author_names,
-                "abstract": abstract,
-                "publication_date": pub_date,
-                "doi": doi,
-                "author_disclosures": author_cois,
-                "countries": countries
-            }
+            if abstract_parts:  # Structured abstract with subsections
+                abstract_text = []
+                for part in abstract_parts:
+                    try:
+                        section_title = part.find_element(By.TAG_NAME, "h3").text
+                        content = part.find_element(By.CSS_SELECTOR, 'div[role="paragraph"]').text
+                        abstract_text.append(f"{section_title}: {content}")
+                    except NoSuchElementException:
+                        continue
+                abstract = "\n\n".join(abstract_text)
+            else:  # Unstructured abstract
+                paragraphs = abstract_section.find_elements(By.CSS_SELECTOR, 'div[role="paragraph"]')
+                abstract = "\n\n".join(para.text for para in paragraphs)
         
-        except TimeoutException as te:
-            return None
+        # Extract the publication date
+        pub_date = "Publication date not found"
+        if 'publication_date' in found:
+            pub_date = driver.find_element(By.CSS_SELECTOR, FIELDS['publication_date']).get_attribute("content")
+        
+        # Extract authors' disclosures
+        print("Looking for disclosures...")
+        # The page is already loaded, so parse its source instead of fetching it again
+        page_source = driver.page_source
+        author_cois = extract_author_coi(page_source)
+        
+        # Extract countries
+        countries = extract_countries(driver) if 'authors' in found else []
+        
+        # Return the extracted information
+        return {
+            "title": title,
+            "authors": author_names,
+            "abstract": abstract,
+            "publication_date": pub_date,
+            "doi": doi,
+            "author_disclosures": author_cois,
+            "countries": countries,
+            "html": page_source
+        }
             
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        inc('scrape_errors_total', error=type(e).__name__)
+        # The browser may have crashed; start a fresh one for the next URL
+        session.reset()
         return None
         
     finally:
-        driver.quit()
+        if own_session:
+            session.quit()
+
+# CSV headers
+HEADERS = ['title', 'authors', 'countries', 'abstract', 'publication_date', 'doi', 'author_disclosures']
+
+def to_csv_row(result):
+    """Flatten a scrape result into one CSV row."""
+    return {
+        'title': result['title'],
+        'authors': '; '.join(result['authors']),
+        'countries': '; '.join(result['countries']),
+        'abstract': result['abstract'],
+        'publication_date': result['publication_date'],
+        'doi': result['doi'],
+        'author_disclosures': str(result['author_disclosures'])  # Convert dict to string
+    }
+
+def scrape_article(url, session=None, static=True, rate_limiter=None):
+    """
+    Scrape one article, trying a plain HTTP fetch first and falling back to the
+    browser only when the static parse fails or comes back incomplete.
+    The browser in `session` is only started if a fallback is actually needed.
+    With a `rate_limiter`, each of the (up to two) fetches of the page waits for its slot.
+    """
+    if static:
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        with timer('scrape_article_seconds', path='static'):
+            result = scrape_asco_article_static(url)
+        inc('scrape_articles_total', path='static', result='ok' if result else 'incomplete')
+        if result:
+            return result
+        print("Static parse incomplete, falling back to browser...")
+    if rate_limiter is not None:
+        rate_limiter.wait(url)
+    with timer('scrape_article_seconds', path='browser'):
+        result = scrape_asco_article(url, session)
+    inc('scrape_articles_total', path='browser', result='ok' if result else 'failed')
+    return result
 
 if __name__ == "__main__":
-    with open('data/jco_urls.jsonl', 'r') as file:
-        urls = [json.loads(line)['url'] for line in file]
-    
-    # CSV headers
-    headers = ['title', 'authors', 'countries', 'abstract', 'publication_date', 'doi', 'author_disclosures']
+    parser = argparse.ArgumentParser(description="Scrape the JCO articles listed in URL files")
+    parser.add_argument('--urls', nargs='+', default=['data/jco_urls.jsonl'],
+                        help="URL files to crawl, e.g. some of the per-year shards in data/jco_url_index/")
+    parser.add_argument('--workers', type=int, default=1, help="number of parallel browsers")
+    parser.add_argument('--delay', type=float, default=1.0, help="minimum seconds between requests to the same host")
+    parser.add_argument('--max-pages', type=int, default=200, help="recycle each browser after this many pages")
+    parser.add_argument('--state', default='data/crawl_state.sqlite', help="crawl state store used to resume interrupted runs")
+    parser.add_argument('--max-attempts', type=int, default=5, help="give up on a URL after this many failures")
+    parser.add_argument('--no-static', action='store_true', help="always render pages in the browser, skipping the HTTP fast path")
+    parser.add_argument('--archive', default='data/html_archive', help="directory of the raw HTML archive")
+    parser.add_argument('--no-archive', action='store_true', help="do not keep the fetched pages")
+    parser.add_argument('--output', help="CSV to append to (default: a new timestamped file in data/)")
+    parser.add_argument('--existing', help="articles CSV from earlier runs; URLs whose DOI it already holds are not crawled")
+    parser.add_argument('--retry-failed', action='store_true', help="retry URLs that used up all their attempts in earlier runs")
+    parser.add_argument('--wait-times', default='data/wait_times.json',
+                        help="learned per-field wait times, loaded at start and saved at the end")
+    parser.add_argument('--metrics', default='data/metrics/asco_web_scraper',
+                        help="metrics file prefix: appends <prefix>.jsonl and rewrites <prefix>.prom")
+    args = parser.parse_args()
+    configure(args.metrics)
+    wait_times = WaitTimes(args.wait_times)
+
+    urls = []
+    for path in args.urls:
+        with open(path, 'r') as file:
+            urls.extend(json.loads(line)['url'] for line in file)
+
+    # URLs already scraped in a previous run are skipped; failed ones are retried with backoff
+    state = CrawlState(args.state, max_attempts=args.max_attempts)
+    state.add(urls)
+    if args.existing and os.path.exists(args.existing):
+        # articles scraped outside this state store (e.g. before it existed) count as done
+        with open(args.existing, newline='', encoding='utf-8') as file:
+            known = {normalize_doi(row['doi']) for row in csv.DictReader(file)}
+        for url in urls:
+            if normalize_doi(url.split('/doi/', 1)[-1]) in known and state.status(url) != 'ok':
+                state.mark_ok(url)
+    if args.retry_failed:
+        print(f"Retrying {state.retry_failed()} URLs that failed in earlier runs")
+    print(f"Crawl state: {state.counts()}")
+    archive = None if args.no_archive else HtmlArchive(args.archive)
     
     # Create/open CSV file
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"data/asco_articles_{timestamp}.csv"
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        writer.writeheader()
+    if args.output:
+        filename = args.output
+    else:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = f"data/asco_articles_{timestamp}.csv"
+    rate_limiter = HostRateLimiter(min_interval=args.delay)
+    # a partial row left by a killed run is cut off before appending; its URL was never marked ok
+    with TableAppender(filename) as appender:
+        if appender.columns is None:
+            appender.append(pd.DataFrame(columns=HEADERS))
         
-        for url in urls:
-            result = scrape_asco_article(url)
-            
-            if result:
-                row = {
-                    'title': result['title'],
-                    'authors': '; '.join(result['authors']),
-                    'countries': '; '.join(result['countries']),
-                    'abstract': result['abstract'],
-                    'publication_date': result['publication_date'],
-                    'doi': result['doi'],
-                    'author_disclosures': str(result['author_disclosures'])  # Convert dict to string
-                }
-                
-                writer.writerow(row)
-            else:
-                print(f"Failed to extract data from: {url}")
+        rounds = 0
+        while True:
+            todo = state.due()
+            if not todo:
+                # Wait for the backoff of the next failed URL, if any are left to retry
+                next_due = state.next_due()
+                if next_due is None:
+                    break
+                time.sleep(max(0, next_due - time.time()))
+                continue
+            if rounds:
+                # URLs due again in a later round failed earlier in this run
+                inc('crawl_retries_total', len(todo))
+            rounds += 1
+
+            # Workers only scrape; all rows are written here, by a single writer
+            # scrape_article waits on the limiter before each fetch, the static one and the browser fallback
+            for url, result in crawl(todo, partial(scrape_article, static=not args.no_static, rate_limiter=rate_limiter),
+                                     workers=args.workers, max_pages=args.max_pages):
+                if result:
+                    # keep the raw page so extraction can be re-run later without crawling
+                    if archive is not None:
+                        archive.put(result['html'], result['doi'], url)
+                    appender.append(pd.DataFrame([to_csv_row(result)], columns=HEADERS))
+                    state.mark_ok(url)
+                    inc('crawl_pages_total', result='ok')
+                else:
+                    print(f"Failed to extract data from: {url}")
+                    state.mark_failed(url, "no data extracted")
+                    inc('crawl_pages_total', result='failed')
             
     
-    print("\nAll articles have been processed and saved to asco_articles.csv")
+    print(f"Crawl state: {state.counts()}")
+    state.close()
+    wait_times.save()
+    if archive is not None:
+        archive.close()
+    # the CSV is the crash-safe log of the crawl; later stages read the typed Parquet copy
+    parquet_path = os.path.splitext(filename)[0] + '.parquet'
+    save(load(filename), parquet_path)
+    print(f"\nAll articles have been processed and saved to {filename} and {parquet_path}")
+    print(report())
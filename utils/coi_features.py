@@ -0,0 +1,175 @@
+"""
+COI feature computation for the analysis dataset.
+
+Computes the same columns as the per-row loops in dataset_processing.ipynb
+(no_author_with_any_coi, coi_employment, ..., coi_honoraria_last_author) in one pass
+over the exploded disclosure table from utils.disclosures, and writes the analysis
+dataset directly.
+
+Usage:
+    python -m utils.coi_features results/asco_articles_with_company_name_variants.csv results/analysis_dataset.csv
+    python -m utils.coi_features ... --compare-notebook   # also run the notebook cells and report the speedup
+"""
+
+import argparse
+import ast
+import json
+import time
+import numpy as np
+import pandas as pd
+from utils.disclosures import Category, build_disclosure_table, load_disclosure_table
+from utils.matcher import match_disclosures
+from utils.dataset import JOINED_COLUMNS, load, save, to_csv_frame
+from utils.countries import normalize_country, normalize_countries
+
+# (feature prefix, category) pairs, in the notebook's column order
+CATEGORY_FEATURES = [
+    ('coi_employment', Category.EMPLOYMENT),
+    ('coi_advisory_consulting', Category.CONSULTING),
+    ('coi_speakers_bureau', Category.SPEAKERS),
+    ('coi_honoraria', Category.HONORARIA),
+]
+AUTHOR_FEATURES = [
+    ('coi_employment', Category.EMPLOYMENT),
+    ('coi_advisory', Category.CONSULTING),
+    ('coi_speakers', Category.SPEAKERS),
+    ('coi_honoraria', Category.HONORARIA),
+]
+DROP_COLUMNS = ['authors', 'countries', 'author_disclosures', 'company_name', 'abstract', 'doi']
+
+def country_features(countries):
+    """
+    Canonical `countries` plus multiple_nationality and main_country, as in the notebook.
+    Each distinct country string is looked up once in the utils.countries table and mapped back.
+    """
+    parts = countries.dropna().str.split(';').explode()
+    normalized = parts.map({part: normalize_country(part) for part in parts.unique()})
+    joined = normalized.groupby(level=0).agg('; '.join)
+    countries = joined.reindex(countries.index).where(countries.notna(), countries)
+
+    n_countries = normalized.groupby(level=0).nunique().reindex(countries.index, fill_value=1)
+    multiple_nationality = (n_countries > 2).astype(int)
+    # The notebook's max(..., key=count) counts stripped names among the unstripped
+    # parts, so only the first listed country ever scores; it picks the first country.
+    main_country = normalized.groupby(level=0).first().reindex(countries.index)
+    main_country = main_country.where(countries.notna(), countries)
+    return countries, multiple_nationality, main_country
+
+def variant_table(company_name_variants):
+    """Exploded (article, variant) pairs, one per distinct variant of each article's company."""
+    articles = []
+    variants = []
+    for article, value in company_name_variants.items():
+        try:
+            parsed = ast.literal_eval(value) if isinstance(value, str) else value
+        except (ValueError, SyntaxError):
+            continue
+        if not isinstance(parsed, (list, tuple, set)):
+            continue
+        for variant in dict.fromkeys(parsed):
+            if isinstance(variant, str):
+                articles.append(article)
+                variants.append(variant)
+    return pd.DataFrame({'article': pd.array(articles, dtype='int32'), 'variant': variants})
+
+def text_matches(entries, variants):
+    """
+    Disclosures (article, author, disclosure, category) whose text contains at least one
+    non-empty company variant of the article.
+    """
+    hits = match_disclosures(entries, variants)
+    return hits.drop_duplicates(['article', 'author', 'disclosure'])[['article', 'author', 'disclosure', 'category']]
+
+def compute_coi_features(index, authors, entries, variants):
+    """All COI count columns, indexed like the article table."""
+    features = pd.DataFrame(index=index)
+    matches = text_matches(entries, variants)
+
+    # distinct author names with any disclosure naming the company
+    named = matches.merge(authors, on=['article', 'author'])
+    features['no_author_with_any_coi'] = named.groupby('article')['name'].nunique()
+
+    # exact matches of the company tokens of one category (the token keeps its '(Inst)')
+    exact = entries.merge(variants, left_on=['article', 'token'], right_on=['article', 'variant'])
+    # the notebook gives up on an article when one of the category's disclosures has no ':'
+    colon_free = np.array([':' not in text for text in entries['text'].cat.categories], dtype=bool)
+    no_colon = entries[colon_free[entries['text'].cat.codes.to_numpy()]]
+    for column, category in CATEGORY_FEATURES:
+        counts = exact[exact['category'] == category].groupby('article').size()
+        broken = no_colon.loc[no_colon['category'] == category, 'article'].unique()
+        features[column] = counts.drop(broken, errors='ignore')
+
+    # first and last author of every article
+    last_author = authors.groupby('article')['author'].max()
+    is_first = matches['author'] == 0
+    is_last = matches['author'].values == last_author.reindex(matches['article']).values
+    features['first_author_coi_all'] = matches[is_first].groupby('article').size().clip(upper=1)
+    features['last_author_coi_all'] = matches[is_last].groupby('article').size().clip(upper=1)
+    for prefix, category in AUTHOR_FEATURES:
+        in_category = matches['category'] == category
+        features[f'{prefix}_first_author'] = matches[is_first & in_category].groupby('article').size().clip(upper=1)
+        features[f'{prefix}_last_author'] = matches[is_last & in_category].groupby('article').size().clip(upper=1)
+
+    return features.fillna(0).astype(int)
+
+def build_analysis_dataset(df, disclosures=None, start_date='2010-01-01'):
+    """
+    Turn the articles-with-company-variants table into the analysis dataset.
+    `disclosures` is an (authors, entries) pair from utils.disclosures; it is built
+    from the author_disclosures column when not given.
+    """
+    # authors and countries are counted and split as their '; '-joined CSV strings
+    df = to_csv_frame(df.reset_index(drop=True), columns=JOINED_COLUMNS)
+    df['countries'], df['multiple_nationality'], df['main_country'] = country_features(df['countries'])
+    df['no_total_authors'] = df['authors'].apply(lambda x: x.count(';') + 1 if isinstance(x, str) else 0)
+
+    authors, entries = disclosures if disclosures is not None else build_disclosure_table(df['author_disclosures'])
+    variants = variant_table(df['company_name_variants'])
+    df = df.join(compute_coi_features(df.index, authors, entries, variants))
+
+    df['publication_date'] = pd.to_datetime(df['publication_date'])
+    df = df[df['publication_date'] >= start_date]
+    return df.drop(columns=DROP_COLUMNS)
+
+def run_notebook(path, df):
+    """Run the notebook's feature cells on `df` and return its analysis dataset (for comparison)."""
+    with open(path) as file:
+        notebook = json.load(file)
+    cells = [''.join(cell['source']) for cell in notebook['cells'] if cell['cell_type'] == 'code']
+    namespace = {'pd': pd, 'df': df.copy()}
+    for source in cells:
+        # skip the input/output cells and the bare display
+        if 'read_csv' in source or 'to_csv' in source or source.strip() == 'df.head()':
+            continue
+        exec(source, namespace)
+    return namespace['df_analysis']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the COI features and write the analysis dataset")
+    parser.add_argument('articles', help="CSV or Parquet table of articles with company_name_variants")
+    parser.add_argument('output', help="analysis dataset to write (.parquet for Parquet, CSV otherwise)")
+    parser.add_argument('--disclosures', help="directory saved by utils.disclosures (default: parse author_disclosures)")
+    parser.add_argument('--compare-notebook', action='store_true', help="also run dataset_processing.ipynb and compare results and timing")
+    args = parser.parse_args()
+
+    articles = load(args.articles)
+    disclosures = load_disclosure_table(args.disclosures) if args.disclosures else None
+
+    start = time.perf_counter()
+    analysis = build_analysis_dataset(articles, disclosures)
+    elapsed = time.perf_counter() - start
+    save(analysis, args.output)
+    print(f"Wrote {len(analysis)} articles to {args.output} in {elapsed:.2f}s")
+
+    if args.compare_notebook:
+        start = time.perf_counter()
+        # the scraper now writes canonical countries, on which the notebook's own fix-ups change nothing
+        notebook_input = to_csv_frame(articles)
+        notebook_input['countries'] = normalize_countries(notebook_input['countries'])
+        expected = run_notebook('dataset_processing.ipynb', notebook_input)
+        notebook_elapsed = time.perf_counter() - start
+        expected = expected.reset_index(drop=True)
+        actual = to_csv_frame(analysis).reset_index(drop=True)[list(expected.columns)]
+        mismatched = [column for column in expected.columns if not expected[column].equals(actual[column])]
+        print(f"Notebook: {notebook_elapsed:.2f}s, speedup {notebook_elapsed / elapsed:.1f}x")
+        print("Identical to the notebook" if not mismatched else f"Columns differing from the notebook: {mismatched}")
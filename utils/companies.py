@@ -0,0 +1,53 @@
+"""
+Local normalization of company names, so spellings such as "Bristol-Myers Squibb",
+"Bristol Myers Squibb Inc." and "bristol-myers squibb (Inst)" compare equal.
+"""
+
+import re
+
+# legal-form and generic suffixes that do not distinguish one company from another
+SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'llc',
+    'plc', 'ag', 'sa', 'nv', 'bv', 'gmbh', 'kk', 'spa', 'lp', 'group', 'holdings',
+}
+
+NOT_A_COMPANY = {'', 'n/a', 'na', 'none', 'unsure', 'unknown'}
+
+def company_key(name):
+    """
+    Lower-cased name with punctuation, trailing markers such as '(Inst)' or '(I)' and
+    trailing legal suffixes removed.
+    """
+    if not isinstance(name, str):
+        return ''
+    name = re.sub(r'(\s*\([^()]*\))+\s*$', '', name.replace('(Inst)', ''))
+    words = re.sub(r'[^0-9a-z]+', ' ', name.lower()).split()
+    while words and words[-1] in SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+def is_company(name):
+    """Whether an LLM/company field holds an actual company rather than 'N/A' or 'unsure'."""
+    return isinstance(name, str) and name.strip().lower() not in NOT_A_COMPANY
+
+def same_company(name, other):
+    """
+    Whether two names refer to the same company: equal keys, or one key is a
+    whole-word prefix of the other ("Merck" / "Merck Sharp & Dohme").
+    """
+    key, other = company_key(name), company_key(other)
+    if not key or not other:
+        return False
+    return key == other or other.startswith(key + ' ') or key.startswith(other + ' ')
+
+# academic, clinical and public bodies that appear in COI lists but do not make products
+NON_COMMERCIAL = re.compile(
+    r'\b(universit\w*|univ|college|school|hospital\w*|clinic|klinikum|medical cent(er|re)|cancer cent(er|re)'
+    r'|health system|institute|ministry|government|department|society|association|academy|council'
+    r'|national institutes? of health|nih|nci)\b',
+    re.IGNORECASE,
+)
+
+def is_non_commercial(name):
+    """Whether a COI entry names a university, hospital or similar non-commercial body."""
+    return bool(NON_COMMERCIAL.search(name))
@@ -0,0 +1,183 @@
+"""
+Corpus-level company-name canonicalization for company_clean_name.py.
+
+Instead of asking the LLM, article by article, which names in the COI list are forms of
+the article's company, all distinct company strings of all disclosures are clustered once:
+
+1. names with the same company_key() ("Bristol-Myers Squibb" / "Bristol Myers Squibb Inc.")
+   or nearly the same key (difflib ratio >= FUZZY_RATIO, e.g. typos) form one cluster;
+2. a company's aliases are its cluster plus combined names that list it
+   ("Roche/Genentech" for Roche);
+3. names that only share a distinctive word with the company ("Eli Lilly" / "Lilly",
+   "Merck" / "Merck Serono") are candidates that the LLM decides on, once per company;
+4. so are the commercial names that occur most often in the COI lists of the company's own
+   articles (at most MAX_COOCCURRING), which is where abbreviations and subsidiaries that
+   share no word with it turn up ("BMS" for Bristol-Myers Squibb, "Janssen" for Johnson &
+   Johnson, "MSD" for Merck).
+
+Every decision is kept in a persistent alias table (data/company_aliases.csv) with one
+row per (company, name) pair, including rejected candidates, so later runs only ask about
+names they have not seen. Articles then look up their company's aliases in a dict.
+"""
+
+import difflib
+import os
+from collections import Counter, defaultdict
+import pandas as pd
+from utils.companies import company_key, is_company, is_non_commercial
+
+FUZZY_RATIO = 0.92
+# co-occurring names sent to the LLM per company, most frequent first
+MAX_COOCCURRING = 20
+
+# words that many unrelated company names share
+GENERIC_WORDS = {
+    'pharmaceutical', 'pharmaceuticals', 'pharma', 'pharmaceutica', 'oncology', 'therapeutics',
+    'biosciences', 'bioscience', 'biotech', 'biotechnology', 'biopharma', 'biopharmaceuticals',
+    'bio', 'biologics', 'medical', 'medicine', 'medicines', 'health', 'healthcare', 'sciences',
+    'science', 'life', 'laboratories', 'laboratory', 'labs', 'international', 'global',
+    'diagnostics', 'genetics', 'genomics', 'technologies', 'systems', 'the', 'and', 'of', 'us',
+    'usa', 'japan', 'china', 'europe', 'america', 'research', 'institute', 'foundation',
+}
+
+def name_words(name):
+    """The distinctive words of a company name."""
+    return {word for word in company_key(name).split() if len(word) > 2 and word not in GENERIC_WORDS}
+
+def cluster_names(names):
+    """Group names whose keys are equal or nearly equal; returns key -> set of names."""
+    clusters = defaultdict(set)
+    for name in names:
+        key = company_key(name)
+        if key:
+            clusters[key].add(name)
+
+    # union-find over keys; fuzzy comparisons only between keys that share their first word
+    parent = {key: key for key in clusters}
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+    blocks = defaultdict(list)
+    for key in clusters:
+        blocks[key.split()[0]].append(key)
+    for keys in blocks.values():
+        for i, key in enumerate(keys):
+            matcher = difflib.SequenceMatcher(None, key)
+            for other in keys[i + 1:]:
+                matcher.set_seq1(other)
+                if matcher.real_quick_ratio() >= FUZZY_RATIO and matcher.ratio() >= FUZZY_RATIO:
+                    parent[find(other)] = find(key)
+
+    merged = defaultdict(set)
+    for key, members in clusters.items():
+        merged[find(key)] |= members
+    return {key: merged[find(key)] for key in clusters}
+
+
+class AliasTable:
+    def __init__(self, path='data/company_aliases.csv'):
+        self.path = path
+        # company key -> {name: is_alias}
+        self.decisions = defaultdict(dict)
+        self.rows = []
+        if os.path.exists(path):
+            self.rows = pd.read_csv(path, keep_default_na=False).to_dict('records')
+        for row in self.rows:
+            self.decisions[company_key(row['company'])][row['name']] = bool(row['is_alias'])
+
+    def aliases(self, company):
+        """All names recorded as forms of `company`."""
+        return {name for name, is_alias in self.decisions.get(company_key(company), {}).items() if is_alias}
+
+    def known(self, company):
+        """Names already decided on for `company`, as aliases or not."""
+        return set(self.decisions.get(company_key(company), {}))
+
+    def add(self, company, names, is_alias, source):
+        key = company_key(company)
+        for name in names:
+            if name not in self.decisions[key]:
+                self.decisions[key][name] = is_alias
+                self.rows.append({'company': company, 'name': name, 'is_alias': is_alias, 'source': source})
+
+    def variants(self, company, coi_companies):
+        """The names in one article's COI list that are forms of `company`, in a stable order."""
+        aliases = self.aliases(company)
+        return sorted(name for name in coi_companies if name in aliases)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        pd.DataFrame(self.rows, columns=['company', 'name', 'is_alias', 'source']).to_csv(self.path + '.tmp', index=False)
+        os.replace(self.path + '.tmp', self.path)
+
+
+class Canonicalizer:
+    """Local alias resolution over all distinct COI company names of a corpus."""
+
+    def __init__(self, names, cooccurring=None):
+        """
+        `names` are all distinct COI company names; `cooccurring` maps an article company
+        to a Counter of how many of its articles list each COI name.
+        """
+        self.names = set(names)
+        self.cooccurring = defaultdict(Counter)
+        for company, counts in (cooccurring or {}).items():
+            if is_company(company):
+                self.cooccurring[company_key(company)].update(counts)
+        self.clusters = cluster_names(self.names)
+        # distinctive word -> names containing it, and key -> names listing it in a combination
+        self.by_word = defaultdict(set)
+        self.by_part = defaultdict(set)
+        for name in self.names:
+            for word in name_words(name):
+                self.by_word[word].add(name)
+            if '/' in name:
+                for part in name.split('/'):
+                    self.by_part[company_key(part)].add(name)
+
+    def local_aliases(self, company):
+        """Names that are forms of `company` by key, fuzzy match or as part of a combination."""
+        key = company_key(company)
+        aliases = set(self.clusters.get(key, ()))
+        if not aliases:
+            # the company itself may not occur in any COI list; match it against the clusters fuzzily
+            close = difflib.get_close_matches(key, list(self.clusters), n=1, cutoff=FUZZY_RATIO)
+            if close:
+                aliases = set(self.clusters[close[0]])
+        for alias_key in {company_key(alias) for alias in aliases} | {key}:
+            aliases |= self.by_part.get(alias_key, set())
+        return aliases
+
+    def candidates(self, company, aliases, known=frozenset()):
+        """
+        Names for the LLM to decide on: other names sharing a distinctive word with
+        `company`, and the commercial names most often listed in its own articles
+        (excluding `aliases` and `known` decisions).
+        """
+        found = set()
+        for word in name_words(company):
+            found |= self.by_word.get(word, set())
+        # the top names are picked before the decided ones are dropped, and ties are broken
+        # by name rather than by set order, so an unchanged corpus asks about the same names
+        # every run and about none once they are decided
+        counts = self.cooccurring[company_key(company)]
+        cooccurring = [name for name in sorted(counts, key=lambda name: (-counts[name], name))
+                       if name not in aliases and not is_non_commercial(name)]
+        found |= set(cooccurring[:MAX_COOCCURRING])
+        return found - aliases - known
+
+    def questions(self, companies, table):
+        """
+        Record each company's local aliases in the AliasTable `table` and return the
+        (company, candidates) pairs that still need the LLM, in company order.
+        """
+        questions = []
+        for company in sorted(companies):
+            local = self.local_aliases(company)
+            table.add(company, local, True, 'local')
+            unresolved = self.candidates(company, local, table.known(company))
+            if unresolved:
+                questions.append((company, unresolved))
+        return questions
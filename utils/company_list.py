@@ -0,0 +1,55 @@
+"""
+Compact company lists for the company_id.py prompt.
+
+The raw list of an article is every company token of every author's disclosures; for
+large multi-center trials that is hundreds of names, mostly institutions or repeated
+spellings. compact_company_list() keeps one spelling per company, drops non-commercial
+bodies and free-text entries, orders the rest by how many disclosures name them, and
+optionally cuts the list at a token budget. The known manufacturers of the products an
+article mentions are put first and always kept, so a budget cannot cut them; other
+manufacturers can still fall off the end, which is why company_id.py sets no budget
+unless asked to.
+"""
+
+from collections import Counter, defaultdict
+from utils.companies import company_key, is_non_commercial, same_company
+from utils.disclosures import NO_COI, split_companies
+from utils.llm import MODEL, count_tokens
+
+# longer entries are sentences ("I have a patent pending related to ...") rather than names
+MAX_NAME_WORDS = 8
+
+def compact_company_list(disclosures, max_tokens=None, model=MODEL, makers=()):
+    """
+    Company names of an article's parsed disclosures, most often disclosed first,
+    keeping as many as fit in `max_tokens` of the prompt's set repr (all if None).
+    Names matching one of `makers` (the known manufacturers of the article's products)
+    come first and are kept regardless of the budget.
+    """
+    counts = Counter()
+    spellings = defaultdict(Counter)
+    for author in disclosures:
+        for disclosure in author['Disclosures']:
+            for _, company, _ in split_companies(disclosure):
+                if not company or company == NO_COI or len(company.split()) > MAX_NAME_WORDS or is_non_commercial(company):
+                    continue
+                key = company_key(company)
+                if key:
+                    counts[key] += 1
+                    spellings[key][company] += 1
+
+    # ties are broken by name so the prompt, and its cache key, do not change between runs
+    ranked = [spellings[key].most_common(1)[0][0] for key, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+    pinned = [name for name in ranked if any(same_company(name, maker) for maker in makers)]
+    ranked = pinned + [name for name in ranked if name not in pinned]
+    if max_tokens is None:
+        return ranked
+    kept = []
+    used = 2  # the braces
+    for name in ranked:
+        cost = count_tokens(repr(name) + ', ', model)
+        if used + cost > max_tokens and name not in pinned:
+            break
+        kept.append(name)
+        used += cost
+    return kept
@@ -0,0 +1,194 @@
+"""
+Canonical country names for author affiliations.
+
+The scrapers take the last comma-separated part of each affiliation, which may be a
+country ("Germany", "UK", "the Netherlands"), a US state ("NY", "TX."), a city and
+state ("Boston MA") or trailing noise ("USA. name@hospital.org"). All of these are
+resolved through one lookup table built at import time: country names and their
+aliases (case-insensitive), plus upper-case US state, Canadian province, Australian
+state and country codes. When the whole part is not known, its last words are looked
+up, but only as a country name, a state or province name or a code: parts of a
+country (Wales, England) would turn "New South Wales" into the UK, and names that are
+both a country and a US state (Georgia) are left as written rather than guessed.
+Names the table does not know keep the notebook's fix-ups (two capital letters is a
+US state, anything with "china" is China, trailing dots removed), so canonical names
+pass through dataset_processing.ipynb unchanged.
+
+Usage:
+    python -m utils.countries data/asco_articles.csv data/asco_articles.csv   # canonicalize an existing table
+"""
+
+import argparse
+import functools
+import re
+
+# canonical name -> other spellings; the canonical forms follow the majority in the scraped data
+COUNTRIES = {
+    'USA': ['US', 'U.S', 'U.S.A', 'United States', 'United States of America', 'America'],
+    'United Kingdom': ['UK', 'U.K', 'Great Britain', 'Britain', 'England', 'Scotland', 'Wales', 'Northern Ireland'],
+    'the Netherlands': ['Netherlands', 'The Netherlands', 'Holland', 'Nederland'],
+    'Republic of Korea': ['Korea', 'South Korea', 'S Korea', 'Rep of Korea', 'Korea (South)'],
+    'China': ['PR China', 'P.R. China', 'P. R. China', "People's Republic of China", 'PRC', 'Mainland China'],
+    'Taiwan': ['Taiwan ROC', 'Taiwan (ROC)', 'Taiwan R.O.C'],
+    'Hong Kong': ['Hong Kong SAR', 'HKSAR'],
+    'Germany': ['Deutschland', 'Federal Republic of Germany'],
+    'Spain': ['España', 'Espana'],
+    'Italy': ['Italia'],
+    'Brazil': ['Brasil'],
+    'Czech Republic': ['Czechia'],
+    'Russia': ['Russian Federation'],
+    'Turkey': ['Türkiye', 'Turkiye'],
+    'Iran': ['Islamic Republic of Iran'],
+    'Vietnam': ['Viet Nam'],
+    'United Arab Emirates': ['UAE', 'U.A.E'],
+    'Ireland': ['Republic of Ireland'],
+    'France': [], 'Japan': [], 'Canada': [], 'Switzerland': [], 'Australia': [], 'Belgium': [],
+    'Austria': [], 'Sweden': [], 'Denmark': [], 'India': [], 'Norway': [], 'Greece': [], 'Poland': [],
+    'Hungary': [], 'Singapore': [], 'Chile': [], 'South Africa': [], 'New Zealand': [], 'Finland': [],
+    'Israel': [], 'Portugal': [], 'Malaysia': [], 'Argentina': [], 'Egypt': [], 'Qatar': [],
+    'Pakistan': [], 'Philippines': [], 'Romania': [], 'Saudi Arabia': [], 'Peru': [], 'Serbia': [],
+    'Mexico': [], 'Ukraine': [], 'Jordan': [], 'Thailand': [], 'Indonesia': [], 'Colombia': [],
+    'Croatia': [], 'Slovenia': [], 'Slovakia': [], 'Bulgaria': [], 'Luxembourg': [], 'Iceland': [],
+    'Estonia': [], 'Latvia': [], 'Lithuania': [], 'Cyprus': [], 'Malta': [], 'Lebanon': [],
+    'Kuwait': [], 'Oman': [], 'Tunisia': [], 'Morocco': [], 'Nigeria': [], 'Kenya': [], 'Uruguay': [],
+    'Venezuela': [], 'Cuba': [], 'Puerto Rico': [], 'Bangladesh': [], 'Nepal': [], 'Sri Lanka': [],
+    'Belarus': [], 'Georgia': [], 'Armenia': [], 'Kazakhstan': [], 'Ecuador': [], 'Costa Rica': [],
+    'Panama': [], 'Guatemala': [], 'Algeria': [], 'Ethiopia': [], 'Ghana': [], 'Uganda': [],
+    'Tanzania': [], 'Zimbabwe': [], 'Bahrain': [], 'Iraq': [], 'Syria': [], 'Monaco': [],
+}
+
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana',
+    'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine',
+    'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina', 'SD': 'South Dakota',
+    'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VA': 'Virginia',
+    'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+
+# aliases that name a part of a country; matched as the whole part or as its last two or
+# three words ("Belfast Northern Ireland"), but never as its last word ("New England")
+REGION_ALIASES = {'England', 'Scotland', 'Wales', 'Northern Ireland', 'America'}
+
+CANADIAN_PROVINCES = {
+    'AB': 'Alberta', 'BC': 'British Columbia', 'MB': 'Manitoba', 'NB': 'New Brunswick',
+    'NL': 'Newfoundland and Labrador', 'NS': 'Nova Scotia', 'ON': 'Ontario', 'PE': 'Prince Edward Island',
+    'QC': 'Quebec', 'SK': 'Saskatchewan',
+}
+
+AUSTRALIAN_STATES = {
+    'NSW': 'New South Wales', 'VIC': 'Victoria', 'QLD': 'Queensland', 'WA': 'Western Australia',
+    'SA': 'South Australia', 'TAS': 'Tasmania', 'ACT': 'Australian Capital Territory',
+    'NT': 'Northern Territory',
+}
+
+def _build_tables():
+    names = {}
+    codes = {}
+    regions = set()
+    for canonical, aliases in COUNTRIES.items():
+        names[canonical.lower()] = canonical
+        for alias in aliases:
+            # short upper-case codes only match as written, so "us" or "uk" in running text do not
+            if len(alias) <= 3 and alias.isupper():
+                codes[alias] = canonical
+            else:
+                names[alias.lower().rstrip('.')] = canonical
+                if alias in REGION_ALIASES:
+                    regions.add(alias.lower())
+        if canonical.isupper():
+            codes[canonical] = canonical
+    ambiguous = set()
+    for table, country in ((US_STATES, 'USA'), (CANADIAN_PROVINCES, 'Canada'), (AUSTRALIAN_STATES, 'Australia')):
+        for code, name in table.items():
+            # a code taken by an earlier table keeps its meaning (WA is Washington)
+            codes.setdefault(code, country)
+            if names.get(name.lower(), country) != country:
+                # a country and a state of the same name (Georgia): neither is assumed
+                ambiguous.add(name.lower())
+            names[name.lower()] = country
+    for name in ambiguous:
+        del names[name]
+    suffixes = {name: country for name, country in names.items() if name not in regions}
+    return names, suffixes, codes
+
+# lower-cased names, the subset that may be the last word of a longer part, and upper-case codes -> canonical country
+NAMES, SUFFIX_NAMES, CODES = _build_tables()
+EMAIL = re.compile(r'\S+@\S+')
+TRIM = ' .;:()[]'
+
+def _lookup(text, names=NAMES):
+    """Canonical country for one cleaned name or code, or None."""
+    if text.rstrip('.') in CODES:
+        return CODES[text.rstrip('.')]
+    return names.get(text.lower().rstrip('.'))
+
+@functools.lru_cache(maxsize=None)
+def normalize_country(part):
+    """Canonical name for the country part of one affiliation."""
+    text = EMAIL.sub('', part).strip(TRIM)
+    country = _lookup(text)
+    if country is None:
+        # "Boston MA", "Bologna Italy": try the last words, longest first, so that
+        # "Belfast Northern Ireland" is not read as "Ireland"
+        words = text.split()
+        for n in (3, 2, 1):
+            if len(words) > n:
+                country = _lookup(' '.join(words[-n:]).strip(TRIM), NAMES if n > 1 else SUFFIX_NAMES)
+                if country is not None:
+                    break
+    if country is not None:
+        return country
+    # the notebook's fix-ups for names the table does not know
+    text = part.strip()
+    if (len(text) == 2 and text.isupper()) or (len(text) == 3 and text.endswith('.') and text[:2].isupper()):
+        return 'USA'
+    if 'china' in text.lower():
+        return 'China'
+    return text.rstrip('.')
+
+def affiliation_countries(affiliations):
+    """Canonical country of each affiliation text that has one (the part after its last comma)."""
+    countries = []
+    for text in affiliations:
+        if text and "," in text:
+            part = text.split(",")[-1].strip()
+            if part:
+                countries.append(normalize_country(part))
+    return countries
+
+def normalize_countries(countries, sep=';'):
+    """
+    Canonical countries for a whole column of lists or `sep`-joined strings (as in the
+    CSV files). Each distinct name is looked up once and the results are mapped back.
+    """
+    present = countries.dropna()
+    if present.empty:
+        return countries
+    joined = isinstance(present.iloc[0], str)
+    parts = (present.str.split(sep) if joined else present).explode().dropna()
+    normalized = parts.map({part: normalize_country(part) for part in parts.unique()})
+    grouped = normalized.groupby(level=0)
+    result = (grouped.agg('; '.join) if joined else grouped.agg(list)).reindex(countries.index)
+    # missing values and empty lists stay as they were
+    return result.where(result.notna(), countries)
+
+if __name__ == "__main__":
+    from utils.dataset import load, save
+
+    parser = argparse.ArgumentParser(description="Rewrite the countries column of an article table with canonical names")
+    parser.add_argument('input', help="CSV or Parquet article table")
+    parser.add_argument('output', help="table to write (.parquet for Parquet, CSV otherwise)")
+    args = parser.parse_args()
+
+    df = load(args.input)
+    before = df['countries'].copy()
+    df['countries'] = normalize_countries(df['countries'])
+    changed = (before.astype(str) != df['countries'].astype(str)).sum()
+    save(df, args.output)
+    print(f"Canonicalized countries of {changed} of {len(df)} articles; saved to {args.output}")
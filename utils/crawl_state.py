@@ -0,0 +1,87 @@
+import sqlite3
+import time
+
+
+class CrawlState:
+    """
+    Persistent per-URL crawl status, stored in SQLite so an interrupted crawl can resume.
+
+    Every URL is 'pending', 'ok' or 'failed', together with its attempt count and last
+    error. Failed URLs become due again after an exponential backoff
+    (base_delay * 2 ** (attempts - 1) seconds) until they reach max_attempts.
+    """
+
+    def __init__(self, path='data/crawl_state.sqlite', max_attempts=5, base_delay=60):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                updated REAL
+            )
+        ''')
+        self.conn.commit()
+
+    def add(self, urls):
+        """Register URLs; ones already known keep their status."""
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO urls (url) VALUES (?)", ((url,) for url in urls))
+
+    def due(self):
+        """URLs that still need fetching now: pending ones, and failed ones whose backoff has elapsed."""
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE status != 'ok' AND attempts < ? AND next_attempt <= ? ORDER BY rowid",
+            (self.max_attempts, time.time()),
+        )
+        return [url for (url,) in rows]
+
+    def next_due(self):
+        """Time at which the next failed URL may be retried, or None if nothing is left to retry."""
+        (next_attempt,) = self.conn.execute(
+            "SELECT MIN(next_attempt) FROM urls WHERE status != 'ok' AND attempts < ?",
+            (self.max_attempts,),
+        ).fetchone()
+        return next_attempt
+
+    def mark_ok(self, url):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE urls SET status = 'ok', attempts = attempts + 1, last_error = NULL, updated = ? WHERE url = ?",
+                (time.time(), url),
+            )
+
+    def mark_failed(self, url, error):
+        now = time.time()
+        (attempts,) = self.conn.execute("SELECT attempts FROM urls WHERE url = ?", (url,)).fetchone()
+        attempts += 1
+        with self.conn:
+            self.conn.execute(
+                "UPDATE urls SET status = 'failed', attempts = ?, last_error = ?, next_attempt = ?, updated = ? WHERE url = ?",
+                (attempts, str(error), now + self.base_delay * 2 ** (attempts - 1), now, url),
+            )
+
+    def status(self, url):
+        """Status of `url`, or None if it was never added."""
+        row = self.conn.execute("SELECT status FROM urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def retry_failed(self):
+        """Give URLs that used up their attempts a fresh start; returns how many were reset."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE urls SET attempts = 0, next_attempt = 0 WHERE status = 'failed' AND attempts >= ?",
+                (self.max_attempts,),
+            )
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of URLs per status, e.g. {'ok': 5000, 'failed': 12, 'pending': 252}."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status"))
+
+    def close(self):
+        self.conn.close()
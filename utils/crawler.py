@@ -0,0 +1,105 @@
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlparse
+from utils.utils import DriverSession
+from utils.metrics import inc, observe
+
+
+class HostRateLimiter:
+    """
+    Politeness delay shared by all workers: requests to the same host are spaced at
+    least `min_interval` seconds apart (plus a random jitter), no matter how many
+    workers are running.
+    """
+
+    def __init__(self, min_interval=1.0, jitter=0.5):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        # Reserve the next free slot for this host under the lock, then sleep outside it
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.min_interval + random.uniform(0, self.jitter)
+        delay = slot - time.monotonic()
+        observe('rate_limit_wait_seconds', max(0, delay))
+        if delay > 0:
+            time.sleep(delay)
+
+
+def crawl(urls, scrape, workers=4, rate_limiter=None, max_pages=200):
+    """
+    Scrape `urls` with `workers` threads, each owning its own DriverSession.
+    `scrape(url, session)` is called for every URL; the (url, result) pairs are yielded
+    back to the caller as they complete, so a single consumer can write all results.
+    A `rate_limiter` is waited on once per URL; a `scrape` that may fetch a page more
+    than once should wait on the limiter itself before each fetch instead.
+
+    Threads are enough here: the heavy lifting happens in the Chrome processes, and the
+    URL queue is bounded so the feeder never runs far ahead of the workers.
+    """
+    tasks = queue.Queue(maxsize=workers * 2)
+    results = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Block while the queue is full, but give up once the crawl is stopped
+        while not stop.is_set():
+            try:
+                tasks.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed():
+        for url in urls:
+            if not put(url):
+                return
+        for _ in range(workers):
+            put(done)
+
+    def work():
+        with DriverSession(max_pages) as session:
+            while not stop.is_set():
+                try:
+                    url = tasks.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if url is done:
+                    break
+                if rate_limiter is not None:
+                    rate_limiter.wait(url)
+                try:
+                    result = scrape(url, session)
+                except Exception as e:
+                    print(f"Worker failed on {url}: {str(e)}")
+                    inc('crawl_worker_errors_total', error=type(e).__name__)
+                    session.reset()
+                    result = None
+                results.put((url, result))
+        results.put(done)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads += [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        finished = 0
+        while finished < workers:
+            item = results.get()
+            if item is done:
+                finished += 1
+                continue
+            yield item
+    finally:
+        # Let the workers close their browsers if the consumer stops early
+        stop.set()
@@ -0,0 +1,232 @@
+"""
+Typed storage for the pipeline's article tables (asco_articles, asco_articles_with_company,
+the name-variant table and the analysis dataset).
+
+In CSV, list columns are flattened: `authors` and `countries` are '; '-joined and
+`author_disclosures` / `company_name_variants` hold str() of Python lists, which every
+reader has to literal_eval again. In Parquet they are stored as real nested columns:
+
+    authors, countries          list<string>
+    author_disclosures          list<struct<Author: string, Disclosures: list<string>>>
+    company_name_variants       list<string>
+
+load() and save() pick the format from the file extension, so every script accepts
+either, and return/take the nested columns as Python lists and dicts. Reads can be
+restricted to some columns, iter_batches() streams a file in bounded batches of rows and
+TableAppender appends finished batches to a CSV, so a long job keeps everything it has done.
+
+Usage:
+    python -m utils.dataset data/asco_articles.csv data/asco_articles.parquet
+"""
+
+import argparse
+import ast
+import os
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pandas as pd
+
+DISCLOSURE_TYPE = pa.list_(pa.struct([('Author', pa.string()), ('Disclosures', pa.list_(pa.string()))]))
+
+COLUMN_TYPES = {
+    'title': pa.string(),
+    'authors': pa.list_(pa.string()),
+    'countries': pa.list_(pa.string()),
+    'abstract': pa.string(),
+    'publication_date': pa.string(),
+    'doi': pa.string(),
+    'author_disclosures': DISCLOSURE_TYPE,
+    'product_name': pa.string(),
+    'company_name': pa.string(),
+    'company_in_the_list': pa.bool_(),
+    'company_source': pa.string(),
+    'company_name_variants': pa.list_(pa.string()),
+}
+
+# '; '-joined in CSV
+JOINED_COLUMNS = ['authors', 'countries']
+# str() of a Python literal in CSV
+LITERAL_COLUMNS = ['author_disclosures', 'company_name_variants']
+
+ROW_GROUP_SIZE = 1000
+
+def _is_parquet(path):
+    return str(path).endswith('.parquet')
+
+def _literal(value, column, row):
+    if not isinstance(value, str):
+        return None
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError) as e:
+        print(f"Warning: Could not parse {column} for row {row}")
+        print(f"Error details: {str(e)}")
+        return None
+
+def from_csv_frame(df):
+    """Turn the flattened CSV columns of `df` back into lists and dicts (in place)."""
+    for column in JOINED_COLUMNS:
+        if column in df:
+            df[column] = [value.split('; ') if isinstance(value, str) else [] for value in df[column]]
+    for column in LITERAL_COLUMNS:
+        if column in df:
+            df[column] = [_literal(value, column, row) for row, value in df[column].items()]
+    return df
+
+def to_csv_frame(df, columns=None):
+    """
+    A copy of `df` with the nested columns flattened the way the CSV files store them;
+    `columns` restricts which ones.
+    """
+    df = df.copy()
+    for column in JOINED_COLUMNS:
+        if column in df and (columns is None or column in columns):
+            df[column] = [('; '.join(value) or None) if isinstance(value, list) else value for value in df[column]]
+    for column in LITERAL_COLUMNS:
+        if column in df and (columns is None or column in columns):
+            df[column] = [str(value) if isinstance(value, list) else value for value in df[column]]
+    return df
+
+def to_table(df):
+    """Arrow table of `df`, with the known columns typed (other columns are inferred)."""
+    fields = []
+    for column in df.columns:
+        if column in COLUMN_TYPES and (df[column].dtype == object or pd.api.types.is_string_dtype(df[column])):
+            fields.append(pa.field(column, COLUMN_TYPES[column]))
+        else:
+            fields.append(pa.Schema.from_pandas(df[[column]], preserve_index=False).field(column))
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+def to_frame(table):
+    """DataFrame of an Arrow table, with nested columns as Python lists and dicts."""
+    nested = [field.name for field in table.schema if pa.types.is_nested(field.type)]
+    df = table.drop(nested).to_pandas()
+    for column in nested:
+        df[column] = pd.Series(table.column(column).to_pylist(), index=df.index, dtype=object)
+    return df[table.column_names]
+
+def save(df, path, row_group_size=ROW_GROUP_SIZE):
+    """Write `df` as typed Parquet or, for any other extension, as the flattened CSV."""
+    if _is_parquet(path):
+        pq.write_table(to_table(df), path, row_group_size=row_group_size, compression='zstd')
+    else:
+        to_csv_frame(df).to_csv(path, index=False)
+
+def load(path, columns=None):
+    """Read an article table from Parquet or CSV, optionally only some `columns`."""
+    if _is_parquet(path):
+        return to_frame(pq.read_table(path, columns=columns))
+    return from_csv_frame(pd.read_csv(path, usecols=columns))
+
+def iter_batches(path, columns=None, batch_size=ROW_GROUP_SIZE):
+    """
+    Stream a Parquet or CSV table as DataFrames of up to `batch_size` rows, so only one
+    batch is in memory at a time. The index continues across batches, as if the whole
+    table were loaded.
+    """
+    if not _is_parquet(path):
+        # read_csv chunks already carry a continuing index
+        for df in pd.read_csv(path, usecols=columns, chunksize=batch_size):
+            yield from_csv_frame(df)
+        return
+    offset = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        df = to_frame(pa.Table.from_batches([batch]))
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        yield df
+
+def _complete_length(path):
+    """
+    (end of the last complete CSV record, bytes read) of `path`. A record ends at a
+    newline outside quotes, i.e. after an even number of quote characters (quotes
+    inside fields are doubled), so newlines within abstracts are not mistaken for one.
+    """
+    end = 0
+    quotes = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            quotes += line.count(b'"')
+            if line.endswith(b'\n') and quotes % 2 == 0:
+                end = file.tell()
+                quotes = 0
+        return end, file.tell()
+
+def _truncate_partial_record(path):
+    """Cut `path` back to the end of its last complete CSV record."""
+    end, size = _complete_length(path)
+    if end < size:
+        print(f"Warning: dropping {size - end} bytes of a partial record at the end of {path}")
+        os.truncate(path, end)
+
+def snapshot(path, destination):
+    """
+    Copy the complete records of a CSV that another process may still be appending to,
+    leaving out a last record that is only partly written. Returns whether the whole
+    file as read was copied.
+    """
+    end, size = _complete_length(path)
+    with open(path, 'rb') as source, open(destination + '.tmp', 'wb') as target:
+        while source.tell() < end:
+            target.write(source.read(min(1 << 20, end - source.tell())))
+    os.replace(destination + '.tmp', destination)
+    return end == size
+
+class TableAppender:
+    """
+    Append DataFrames to a flattened CSV table as they are finished. The header is
+    written once, every append is flushed, and the file is fsynced at most every
+    `fsync_interval` seconds (and on close), so a crash loses at most that much work.
+    Columns follow the file's existing header when appending to an earlier run's output;
+    a partial last record left by a killed run is cut off first.
+    """
+
+    def __init__(self, path, fsync_interval=10.0):
+        if _is_parquet(path):
+            raise ValueError(f"{path}: Parquet files cannot be appended to; stream to a CSV and convert it afterwards")
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.columns = None
+        if os.path.exists(path):
+            _truncate_partial_record(path)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.columns = list(pd.read_csv(path, nrows=0).columns)
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.last_sync = time.monotonic()
+        self.rows = 0
+
+    def append(self, df):
+        header = self.columns is None
+        if header:
+            self.columns = list(df.columns)
+        to_csv_frame(df.reindex(columns=self.columns)).to_csv(self.file, header=header, index=False)
+        self.file.flush()
+        self.rows += len(df)
+        if time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an article table between CSV and typed Parquet")
+    parser.add_argument('input', help="CSV or Parquet file to read")
+    parser.add_argument('output', help="file to write; .parquet for Parquet, CSV otherwise")
+    args = parser.parse_args()
+
+    df = load(args.input)
+    save(df, args.output)
+    print(f"Converted {len(df)} rows from {args.input} to {args.output}")
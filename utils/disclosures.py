@@ -0,0 +1,196 @@
+"""
+Parsing of the `author_disclosures` column written by the scraper.
+
+The column holds str(list_of_dicts), one dict per author:
+    [{'Author': 'Jane Doe', 'Disclosures': ['Honoraria: Pfizer, Merck (Inst)', ...]}, ...]
+This module parses it once into a compact long table (one row per company mention)
+with interned strings and a category code, which can be stored as Parquet and
+reloaded by every later stage without evaluating Python literals again.
+
+Usage:
+    python -m utils.disclosures results/asco_articles_with_company_name_variants.csv data/disclosures
+"""
+
+import argparse
+import ast
+import os
+from enum import IntEnum
+import pandas as pd
+from utils.dataset import load
+
+NO_COI = 'No other potential conflicts of interest were reported.'
+
+class Category(IntEnum):
+    OTHER = 0
+    EMPLOYMENT = 1
+    CONSULTING = 2
+    SPEAKERS = 3
+    HONORARIA = 4
+    STOCK = 5
+    RESEARCH = 6
+    TRAVEL = 7
+    PATENTS = 8
+    EXPERT = 9
+    LEADERSHIP = 10
+
+# Matched against the lower-cased start of a disclosure, e.g. "Consulting or Advisory Role: ..."
+CATEGORY_PREFIXES = [
+    ('employment', Category.EMPLOYMENT),
+    ('consulting', Category.CONSULTING),
+    ('consultant', Category.CONSULTING),
+    ('speaker', Category.SPEAKERS),
+    ('honoraria', Category.HONORARIA),
+    ('stock', Category.STOCK),
+    ('research', Category.RESEARCH),
+    ('travel', Category.TRAVEL),
+    ('patent', Category.PATENTS),
+    ('expert', Category.EXPERT),
+    ('leadership', Category.LEADERSHIP),
+]
+
+def categorize(disclosure):
+    lower = disclosure.lower()
+    for prefix, category in CATEGORY_PREFIXES:
+        if lower.startswith(prefix):
+            return category
+    return Category.OTHER
+
+def parse_disclosures(value):
+    """
+    Turn one `author_disclosures` cell into its list of author dicts, dropping the
+    'None' placeholder authors. Raises ValueError/SyntaxError on a malformed cell.
+    """
+    if isinstance(value, list):
+        disclosures = value
+    elif isinstance(value, str):
+        disclosures = ast.literal_eval(value)
+    else:
+        raise ValueError(f"expected a string, got {value!r}")
+    return [author for author in disclosures if author['Author'] != 'None']
+
+def split_companies(disclosure):
+    """
+    The company tokens of one disclosure: the text after the category label, split on
+    commas. Returns (token, company, inst) tuples, where company is the token with its
+    '(Inst)' marker removed.
+    """
+    if ':' in disclosure:
+        disclosure = disclosure.split(':', 1)[1]
+    result = []
+    for token in disclosure.split(','):
+        token = token.strip()
+        result.append((token, token.replace('(Inst)', '').strip(), '(Inst)' in token))
+    return result
+
+def coi_companies(disclosures):
+    """Set of all companies named in an article's disclosures (as sent to the LLM prompts)."""
+    companies = set()
+    for author in disclosures:
+        for disclosure in author['Disclosures']:
+            companies.update(
+                company for _, company, _ in split_companies(disclosure)
+                if company and company != NO_COI
+            )
+    return companies
+
+class _Interner:
+    def __init__(self):
+        self.index = {}
+
+    def __call__(self, value):
+        return self.index.setdefault(value, len(self.index))
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=list(self.index))
+
+def build_disclosure_table(author_disclosures):
+    """
+    Parse a Series of `author_disclosures` cells (indexed by article) in one pass.
+
+    Returns (authors, entries):
+      authors: one row per author -> article, author (position in the list), name
+      entries: one row per company token -> article, author, disclosure (position in
+               the author's list), category (Category code), text (the full disclosure),
+               token, company, inst
+    All string columns are categoricals, so each distinct string is stored once;
+    token and company share one vocabulary.
+    Cells that cannot be parsed are reported and skipped.
+    """
+    names = _Interner()
+    texts = _Interner()
+    companies = _Interner()
+    parsed = {}
+    authors = {'article': [], 'author': [], 'name': []}
+    entries = {'article': [], 'author': [], 'disclosure': [], 'category': [],
+               'text': [], 'token': [], 'company': [], 'inst': []}
+
+    for article, value in author_disclosures.items():
+        try:
+            disclosures = parse_disclosures(value)
+        except (ValueError, SyntaxError) as e:
+            print(f"Warning: Could not parse author disclosures for row {article}")
+            print(f"Error details: {str(e)}")
+            continue
+        for position, author in enumerate(disclosures):
+            authors['article'].append(article)
+            authors['author'].append(position)
+            authors['name'].append(names(author['Author']))
+            for number, disclosure in enumerate(author['Disclosures']):
+                # the same disclosure strings recur across authors and articles; split each once
+                parts = parsed.get(disclosure)
+                if parts is None:
+                    category = categorize(disclosure)
+                    text = texts(disclosure)
+                    parts = parsed[disclosure] = [
+                        (category, text, companies(token), companies(company), inst)
+                        for token, company, inst in split_companies(disclosure)
+                    ]
+                for category, text, token, company, inst in parts:
+                    entries['article'].append(article)
+                    entries['author'].append(position)
+                    entries['disclosure'].append(number)
+                    entries['category'].append(category)
+                    entries['text'].append(text)
+                    entries['token'].append(token)
+                    entries['company'].append(company)
+                    entries['inst'].append(inst)
+
+    authors = pd.DataFrame({
+        'article': pd.array(authors['article'], dtype='int32'),
+        'author': pd.array(authors['author'], dtype='int16'),
+        'name': names.categorical(authors['name']),
+    })
+    entries = pd.DataFrame({
+        'article': pd.array(entries['article'], dtype='int32'),
+        'author': pd.array(entries['author'], dtype='int16'),
+        'disclosure': pd.array(entries['disclosure'], dtype='int16'),
+        'category': pd.array(entries['category'], dtype='int8'),
+        'text': texts.categorical(entries['text']),
+        'token': companies.categorical(entries['token']),
+        'company': companies.categorical(entries['company']),
+        'inst': pd.array(entries['inst'], dtype='bool'),
+    })
+    return authors, entries
+
+def save_disclosure_table(authors, entries, path):
+    """Store the tables as <path>/authors.parquet and <path>/entries.parquet."""
+    os.makedirs(path, exist_ok=True)
+    authors.to_parquet(os.path.join(path, 'authors.parquet'), index=False)
+    entries.to_parquet(os.path.join(path, 'entries.parquet'), index=False)
+
+def load_disclosure_table(path, columns=None):
+    """Load (authors, entries); `columns` restricts which entries columns are read."""
+    authors = pd.read_parquet(os.path.join(path, 'authors.parquet'))
+    entries = pd.read_parquet(os.path.join(path, 'entries.parquet'), columns=columns)
+    return authors, entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse the author_disclosures column once and store it as Parquet")
+    parser.add_argument('articles', help="CSV or Parquet table with an author_disclosures column")
+    parser.add_argument('output', help="directory for authors.parquet and entries.parquet")
+    args = parser.parse_args()
+
+    articles = load(args.articles, columns=['author_disclosures'])
+    authors, entries = build_disclosure_table(articles['author_disclosures'])
+    save_disclosure_table(authors, entries, args.output)
+    print(f"Saved {len(authors)} authors and {len(entries)} company mentions to {args.output}")
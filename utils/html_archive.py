@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+
+# zstd compresses HTML better and faster than gzip; fall back to gzip without it
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class HtmlArchive:
+    """
+    Compressed, content-addressed archive of fetched article pages.
+
+    Each page is stored once under the sha256 of its HTML, as
+    <root>/objects/<ab>/<digest>.html.zst (or .html.gz without zstandard),
+    and <root>/index.sqlite maps each DOI to its latest page, so extraction bugs can
+    be fixed and re-run over the archive without crawling again.
+    """
+
+    def __init__(self, root='data/html_archive'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite'))
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                doi TEXT PRIMARY KEY,
+                url TEXT,
+                digest TEXT NOT NULL,
+                fetched REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def _path(self, digest, extension):
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}{extension}')
+
+    def put(self, html, doi, url=None):
+        """Store a page (once per distinct content) and point `doi` at it; returns the digest."""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self.path(digest) is None:
+            if zstandard is not None:
+                path, compressed = self._path(digest, '.html.zst'), zstandard.ZstdCompressor(level=10).compress(data)
+            else:
+                path, compressed = self._path(digest, '.html.gz'), gzip.compress(data, compresslevel=6)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write under a temporary name first so a crash never leaves a truncated object
+            with open(path + '.tmp', 'wb') as file:
+                file.write(compressed)
+            os.replace(path + '.tmp', path)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (doi, url, digest, fetched) VALUES (?, ?, ?, ?)",
+                (doi, url, digest, time.time()),
+            )
+        return digest
+
+    def path(self, digest):
+        """File holding `digest`, or None if it is not archived."""
+        for extension in ('.html.zst', '.html.gz'):
+            path = self._path(digest, extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def pages(self):
+        """(doi, url, digest) for every archived DOI."""
+        return list(self.conn.execute("SELECT doi, url, digest FROM pages ORDER BY doi"))
+
+    def get(self, doi):
+        """The archived HTML for `doi`, or None."""
+        row = self.conn.execute("SELECT digest FROM pages WHERE doi = ?", (doi,)).fetchone()
+        return read_page(self.path(row[0])) if row else None
+
+    def close(self):
+        self.conn.close()
+
+def read_page(path):
+    """Decompress one archived page. A plain function so worker processes can call it."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstandard is needed to read .zst pages")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = gzip.decompress(data)
+    return data.decode('utf-8')
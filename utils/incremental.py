@@ -0,0 +1,32 @@
+"""
+Helpers for incremental corpus updates, keyed by DOI: find the articles a stage has
+not processed yet, and merge the new results back into the previous output. A chunked
+run resumes from the DOIs its CSV output already holds (output_dois).
+"""
+
+import os
+import pandas as pd
+
+def normalize_doi(doi):
+    """Canonical form of a DOI for comparisons: first line, stripped, lower-cased."""
+    if not isinstance(doi, str):
+        return None
+    doi = doi.split('\n')[0].strip().lower()
+    return doi or None
+
+def new_rows(articles, previous, done_column):
+    """Rows of `articles` whose DOI has no `done_column` result in `previous` yet."""
+    done = set(previous.loc[previous[done_column].notna(), 'doi'].map(normalize_doi))
+    return articles[~articles['doi'].map(normalize_doi).isin(done)]
+
+def merge_rows(previous, updated):
+    """`previous` with rows of the same DOI replaced by those in `updated`, and new ones appended."""
+    replaced = set(updated['doi'].map(normalize_doi))
+    kept = previous[~previous['doi'].map(normalize_doi).isin(replaced)]
+    return pd.concat([kept, updated], ignore_index=True)
+
+def output_dois(path):
+    """Normalized DOIs of the rows already written to the CSV output `path` (empty if it does not exist yet)."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    return set(pd.read_csv(path, usecols=['doi'])['doi'].map(normalize_doi).dropna())
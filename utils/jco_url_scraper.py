@@ -1,45 +1,181 @@
 from paperscraper.pubmed import get_and_dump_pubmed_papers
+import argparse
 import os
 import json
+from collections import defaultdict
+from datetime import date
+from utils.incremental import normalize_doi
 
-jco_paper_query = ['"journal of clinical oncology official journal of the american society of clinical oncology"[Journal]', 
-                   '2000/01/01:2025/01/01[Date - Publication]',
-                   '"clinical trial"[Publication Type]']
-
-if os.path.exists('data/jco_papers.jsonl'):
-    print('jco_papers.jsonl already exists')
-else:
-    get_and_dump_pubmed_papers(jco_paper_query, output_filepath='data/jco_papers.jsonl')
-
-if os.path.exists('data/jco_urls.jsonl'):
-    print('jco_urls.jsonl already exists')
-else:
-    # load jco_papers.jsonl, extract the value of key 'doi'
-    dois = []
-    urls = []
-    with open('data/jco_papers.jsonl', 'r') as file:
+JOURNAL = '"journal of clinical oncology official journal of the american society of clinical oncology"[Journal]'
+CLINICAL_TRIAL = '"clinical trial"[Publication Type]'
+UPDATE_STATE = 'data/jco_update_state.json'
+URL_INDEX = 'data/jco_url_index'
+
+def build_query(start, end):
+    return [JOURNAL, f'{start}:{end}[Date - Publication]', CLINICAL_TRIAL]
+
+jco_paper_query = build_query('2000/01/01', '2025/01/01')
+
+def read_records(papers_path):
+    """Yield (doi, year, raw JSON line) for every JCO record of a PubMed dump, as it is read."""
+    with open(papers_path, 'r') as file:
         for line in file:
             try:
+                record = json.loads(line)
                 # Get the DOI, handle None values
-                doi_raw = json.loads(line).get('doi')
+                doi_raw = record.get('doi')
                 if doi_raw is None:
                     print(f"Warning: DOI is None in line: {line.strip()}")
                     continue
-                    
+
                 doi = doi_raw.split('\n')[0].strip()
-                
-                if doi.startswith('10.1200/JCO'):
-                    dois.append(doi)
-                    url = f"https://ascopubs.org/doi/{doi}"
-                    urls.append(url)
+
+                if doi.upper().startswith('10.1200/JCO'):
+                    # paperscraper writes dates as YYYY-MM-DD
+                    year = str(record.get('date') or '')[:4]
+                    yield doi, year if year.isdigit() else 'unknown', line
                 else:
                     print(f"Skipping non-JCO DOI: {doi}")
-                    
+
             except KeyError:
                 print(f"Warning: No DOI found in line: {line.strip()}")
             except json.JSONDecodeError:
                 print(f"Warning: Could not parse JSON in line: {line.strip()}")
 
-        with open('data/jco_urls.jsonl', 'w') as file:
-            for url in urls:
-                file.write(json.dumps({'url': url}) + '\n')
\ No newline at end of file
+def dedupe(records, seen=None):
+    """Drop records whose normalized DOI was already seen (in `seen` or earlier in the stream)."""
+    seen = set() if seen is None else seen
+    for record in records:
+        key = normalize_doi(record[0])
+        if key in seen:
+            continue
+        seen.add(key)
+        yield record
+
+def doi_url(doi):
+    return f"https://ascopubs.org/doi/{doi}"
+
+def url_doi(url):
+    return url.split('/doi/', 1)[-1]
+
+def doi_year(doi):
+    """Year embedded in a JCO DOI (10.1200/JCO.2005.01.123 or 10.1200/JCO.24.00342), or 'unknown'."""
+    parts = doi.split('.')
+    if len(parts) > 2 and parts[2].isdigit():
+        if len(parts[2]) == 4:
+            return parts[2]
+        if len(parts[2]) == 2:
+            return '20' + parts[2]
+    return 'unknown'
+
+def url_line(doi, year):
+    return json.dumps({'url': doi_url(doi), 'doi': doi, 'year': year}) + '\n'
+
+def read_url_lines(urls_path):
+    """Yield the parsed lines of a URL file; lines from older files only have 'url'."""
+    if not os.path.exists(urls_path):
+        return
+    with open(urls_path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def write_url_index(urls_path='data/jco_urls.jsonl', index_dir=URL_INDEX):
+    """
+    Write the URLs as one sorted, deduplicated shard per publication year,
+    <index_dir>/<year>.jsonl (the PubMed publication year), plus a manifest.json of the number of URLs per shard,
+    so crawls can be split by shard across machines.
+    """
+    shards = defaultdict(dict)
+    for entry in read_url_lines(urls_path):
+        doi = entry.get('doi') or url_doi(entry['url'])
+        # URL files written before the year was recorded fall back to the year in the DOI
+        year = entry.get('year', 'unknown')
+        shards[doi_year(doi) if year == 'unknown' else year].setdefault(normalize_doi(doi), (doi, entry['url']))
+
+    os.makedirs(index_dir, exist_ok=True)
+    manifest = {}
+    for year in sorted(shards):
+        path = os.path.join(index_dir, f'{year}.jsonl')
+        with open(path + '.tmp', 'w') as file:
+            for key in sorted(shards[year]):
+                doi, url = shards[year][key]
+                file.write(json.dumps({'url': url, 'doi': doi, 'year': year}) + '\n')
+        os.replace(path + '.tmp', path)
+        manifest[year] = len(shards[year])
+    with open(os.path.join(index_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=1)
+    print(f"URL index: {sum(manifest.values())} URLs in {len(manifest)} shards in {index_dir}")
+
+def write_urls(papers_path='data/jco_papers.jsonl', urls_path='data/jco_urls.jsonl'):
+    """Stream the deduplicated JCO DOIs of a PubMed dump into a URL file, line by line."""
+    written = 0
+    with open(urls_path + '.tmp', 'w') as file:
+        for doi, year, _ in dedupe(read_records(papers_path)):
+            file.write(url_line(doi, year))
+            written += 1
+    os.replace(urls_path + '.tmp', urls_path)
+    print(f"Wrote {written} URLs to {urls_path}")
+
+def update(papers_path='data/jco_papers.jsonl', urls_path='data/jco_urls.jsonl', state_path=UPDATE_STATE):
+    """
+    Query PubMed only for the publication dates since the last update, append the records
+    whose DOI is not in `papers_path` yet, and append their URLs to `urls_path`.
+    """
+    start = '2025/01/01'
+    if os.path.exists(state_path):
+        with open(state_path) as file:
+            start = json.load(file)['last_update']
+    end = date.today().strftime('%Y/%m/%d')
+
+    # the date range overlaps the previous one by a day; duplicates are dropped by DOI
+    delta_path = f"data/jco_papers_{date.today().strftime('%Y%m%d')}.jsonl"
+    get_and_dump_pubmed_papers(build_query(start, end), output_filepath=delta_path)
+
+    known_urls = {normalize_doi(entry.get('doi') or url_doi(entry['url'])) for entry in read_url_lines(urls_path)}
+    known = set()
+    new_records = 0
+    new_urls = 0
+    with open(urls_path, 'a') as urls:
+        # records from earlier dumps that never got a URL (e.g. an interrupted run)
+        if os.path.exists(papers_path):
+            for doi, year, _ in dedupe(read_records(papers_path), known):
+                if normalize_doi(doi) not in known_urls:
+                    known_urls.add(normalize_doi(doi))
+                    urls.write(url_line(doi, year))
+                    new_urls += 1
+
+        with open(papers_path, 'a') as papers:
+            for doi, year, line in dedupe(read_records(delta_path), known):
+                papers.write(line if line.endswith('\n') else line + '\n')
+                new_records += 1
+                if normalize_doi(doi) not in known_urls:
+                    known_urls.add(normalize_doi(doi))
+                    urls.write(url_line(doi, year))
+                    new_urls += 1
+
+    with open(state_path, 'w') as file:
+        json.dump({'last_update': end}, file)
+    print(f"PubMed {start} to {end}: {new_records} new records, {new_urls} new URLs")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect JCO clinical trial DOIs from PubMed and write their article URLs")
+    parser.add_argument('--update', action='store_true',
+                        help="only query PubMed since the last update and append new DOIs to data/jco_papers.jsonl and data/jco_urls.jsonl")
+    parser.add_argument('--index-dir', default=URL_INDEX, help="directory of the per-year URL shards")
+    args = parser.parse_args()
+
+    if args.update:
+        update()
+    else:
+        if os.path.exists('data/jco_papers.jsonl'):
+            print('jco_papers.jsonl already exists')
+        else:
+            get_and_dump_pubmed_papers(jco_paper_query, output_filepath='data/jco_papers.jsonl')
+
+        if os.path.exists('data/jco_urls.jsonl'):
+            print('jco_urls.jsonl already exists')
+        else:
+            write_urls()
+
+    write_url_index(index_dir=args.index_dir)
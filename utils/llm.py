@@ -0,0 +1,196 @@
+import asyncio
+import functools
+import os
+import random
+import time
+from collections import deque
+from dotenv import load_dotenv
+import openai
+from openai import AsyncOpenAI
+from utils.metrics import inc, timer
+
+# exact token counts need tiktoken (and its encoding files); fall back to an estimate without it
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+load_dotenv()
+
+MODEL = "gpt-4o-2024-11-20"
+
+def get_async_client():
+    """
+    AsyncOpenAI client for the runner below. OAI_BASE_URL can point it at any
+    OpenAI-compatible server (e.g. a local mock). Retries are handled by the runner.
+    """
+    return AsyncOpenAI(
+        api_key=os.getenv('OAI_API_KEY'),
+        base_url=os.getenv('OAI_BASE_URL') or None,
+        max_retries=0,
+    )
+
+def set_repr(items):
+    """
+    repr() of a set with its items sorted. Prompts embed sets of company names, and a
+    plain repr() changes order from run to run, which would defeat the response cache.
+    """
+    if not items:
+        return 'set()'
+    return '{' + ', '.join(repr(item) for item in sorted(items)) + '}'
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        name = 'o200k_base'
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"Warning: No tokenizer for {model}, estimating tokens instead: {str(e)}")
+        return None
+
+def count_tokens(text, model=MODEL):
+    """Tokens in `text` with the model's tokenizer, or ~4 characters per token without tiktoken."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+def estimate_tokens(messages, completion_tokens=100):
+    """Rough token count of a request (~4 characters per token), used for TPM budgeting."""
+    return sum(len(m['content']) for m in messages) // 4 + completion_tokens
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and tokens. Limits follow the
+    x-ratelimit-limit-* headers the API returns, but never exceed the configured
+    rpm/tpm budget. A limit of None means unlimited.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        # the user's budget; the API's limits can only lower it
+        self.configured_rpm = rpm
+        self.configured_tpm = tpm
+        self.window = deque()  # (timestamp, tokens)
+        self.lock = asyncio.Lock()
+
+    def _prune(self, now):
+        while self.window and now - self.window[0][0] >= 60:
+            self.window.popleft()
+
+    async def acquire(self, tokens):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                used_tokens = sum(t for _, t in self.window)
+                requests_ok = self.rpm is None or len(self.window) < self.rpm
+                tokens_ok = self.tpm is None or not self.window or used_tokens + tokens <= self.tpm
+                if requests_ok and tokens_ok:
+                    self.window.append((now, tokens))
+                    return
+                # Sleep until the oldest entry leaves the window
+                await asyncio.sleep(60 - (now - self.window[0][0]) + 0.01)
+
+    def update_from_headers(self, headers):
+        limit_requests = headers.get('x-ratelimit-limit-requests')
+        limit_tokens = headers.get('x-ratelimit-limit-tokens')
+        if limit_requests and limit_requests.isdigit():
+            self.rpm = _lower_limit(self.configured_rpm, int(limit_requests))
+        if limit_tokens and limit_tokens.isdigit():
+            self.tpm = _lower_limit(self.configured_tpm, int(limit_tokens))
+
+def _lower_limit(configured, limit):
+    return limit if configured is None else min(configured, limit)
+
+def _retry_delay(attempt, error, base=1.0, cap=60.0):
+    # Honour Retry-After when the server sends it, otherwise exponential backoff with full jitter
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('retry-after')
+        try:
+            return float(retry_after) + random.uniform(0, 1)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def record_usage(usage, model=MODEL):
+    """Count the tokens of one completion, from the usage block the API returns."""
+    if usage is None:
+        return
+    inc('llm_prompt_tokens_total', usage.prompt_tokens, model=model)
+    inc('llm_completion_tokens_total', usage.completion_tokens, model=model)
+
+def _is_retryable(error):
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+async def parse_completion(client, limiter, messages, response_format, model=MODEL, max_retries=6):
+    """One structured-output request with rate limiting and retries; returns the parsed object."""
+    for attempt in range(max_retries + 1):
+        with timer('llm_rate_limit_wait_seconds'):
+            await limiter.acquire(estimate_tokens(messages))
+        try:
+            with timer('llm_request_seconds', model=model):
+                raw = await client.beta.chat.completions.with_raw_response.parse(
+                    model=model,
+                    messages=messages,
+                    response_format=response_format,
+                )
+        except Exception as e:
+            if attempt == max_retries or not _is_retryable(e):
+                inc('llm_requests_total', model=model, outcome='error')
+                raise
+            delay = _retry_delay(attempt, e)
+            inc('llm_retries_total', model=model, error=type(e).__name__)
+            print(f"Retrying in {delay:.1f}s after error: {str(e)}")
+            await asyncio.sleep(delay)
+            continue
+        limiter.update_from_headers(raw.headers)
+        completion = raw.parse()
+        inc('llm_requests_total', model=model, outcome='ok')
+        record_usage(completion.usage, model)
+        return completion.choices[0].message.parsed
+
+async def parse_completions(message_lists, response_format, concurrency=8, rpm=None, tpm=None, model=MODEL, cache=None):
+    """
+    Run many structured-output requests concurrently, at most `concurrency` in flight.
+    Results are returned in the same order as `message_lists`; a request that still
+    fails after its retries gives None. With an LLMCache, cached requests are answered
+    without a network call and new results are stored.
+    """
+    client = get_async_client()
+    limiter = RateLimiter(rpm, tpm)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(i, messages):
+        if cache is not None:
+            key = cache.key(model, messages, response_format)
+            parsed = cache.get(key, response_format)
+            if parsed is not None:
+                return parsed
+        async with semaphore:
+            try:
+                parsed = await parse_completion(client, limiter, messages, response_format, model)
+            except Exception as e:
+                print(f"Request {i} failed: {str(e)}")
+                return None
+        if cache is not None and parsed is not None:
+            cache.set(key, parsed)
+        return parsed
+
+    try:
+        return await asyncio.gather(*(run(i, messages) for i, messages in enumerate(message_lists)))
+    finally:
+        await client.close()
+
+def parse_all(message_lists, response_format, **kwargs):
+    """Synchronous wrapper around parse_completions for use from scripts."""
+    return asyncio.run(parse_completions(message_lists, response_format, **kwargs))
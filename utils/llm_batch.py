@@ -0,0 +1,135 @@
+import json
+import os
+import time
+from datetime import datetime
+from openai import OpenAI
+from types import SimpleNamespace
+from utils.llm import MODEL, record_usage
+from utils.metrics import inc
+
+def get_client():
+    """Synchronous OpenAI client; OAI_BASE_URL can point it at a local stand-in."""
+    return OpenAI(api_key=os.getenv('OAI_API_KEY'), base_url=os.getenv('OAI_BASE_URL') or None)
+
+def _strict_schema(schema):
+    # Structured outputs in strict mode need every object closed and all its properties required
+    if isinstance(schema, dict):
+        if schema.get('type') == 'object' and 'properties' in schema:
+            schema['additionalProperties'] = False
+            schema['required'] = list(schema['properties'])
+        for value in schema.values():
+            _strict_schema(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict_schema(value)
+    return schema
+
+def response_format_param(response_format):
+    """The response_format request field for a pydantic model, as beta.chat.completions.parse sends it."""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': response_format.__name__,
+            'schema': _strict_schema(response_format.model_json_schema()),
+            'strict': True,
+        },
+    }
+
+def write_batch_file(path, keys, message_lists, response_format, model=MODEL):
+    """Write one /v1/chat/completions request per row to a Batch API input file, with the row key as custom_id."""
+    format_param = response_format_param(response_format)
+    with open(path, 'w', encoding='utf-8') as file:
+        for key, messages in zip(keys, message_lists):
+            file.write(json.dumps({
+                'custom_id': str(key),
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {'model': model, 'messages': messages, 'response_format': format_param},
+            }) + '\n')
+
+def submit_batch(client, path, description=None):
+    """Upload a batch input file and start the batch; returns the batch id."""
+    with open(path, 'rb') as file:
+        input_file = client.files.create(file=file, purpose='batch')
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint='/v1/chat/completions',
+        completion_window='24h',
+        metadata={'description': description} if description else None,
+    )
+    return batch.id
+
+def wait_for_batch(client, batch_id, poll_interval=60):
+    """Poll a batch until it reaches a final state and return it."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done, {counts.failed} failed)")
+        else:
+            print(f"Batch {batch_id}: {batch.status}")
+        if batch.status in ('completed', 'failed', 'expired', 'cancelled'):
+            return batch
+        time.sleep(poll_interval)
+
+def read_batch_results(client, batch, response_format):
+    """Download a finished batch's output and return {custom_id: parsed object}."""
+    results = {}
+    if batch.output_file_id is None:
+        return results
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get('response') or {}
+        model = (response.get('body') or {}).get('model', MODEL)
+        if response.get('status_code') != 200:
+            print(f"Warning: Batch request {record['custom_id']} failed: {record.get('error') or response}")
+            inc('llm_requests_total', model=model, outcome='error')
+            continue
+        inc('llm_requests_total', model=model, outcome='ok')
+        if response['body'].get('usage'):
+            record_usage(SimpleNamespace(**response['body']['usage']), model)
+        content = response['body']['choices'][0]['message'].get('content')
+        if content is None:
+            print(f"Warning: Batch request {record['custom_id']} returned no content")
+            continue
+        results[record['custom_id']] = response_format.model_validate_json(content)
+    return results
+
+def run_batch(keys, message_lists, response_format, name, batch_id=None, model=MODEL, cache=None, poll_interval=60):
+    """
+    Process all requests as one Batch API job and return the parsed results aligned
+    with `keys` (None where a request failed).
+
+    Requests already in the cache are not resubmitted. Pass the `batch_id` printed by
+    an earlier run to resume waiting for that batch instead of submitting a new one.
+    """
+    results = [None] * len(keys)
+    cache_keys = [cache.key(model, messages, response_format) if cache is not None else None for messages in message_lists]
+    pending = []
+    for i, messages in enumerate(message_lists):
+        if cache is not None:
+            results[i] = cache.get(cache_keys[i], response_format)
+        if results[i] is None:
+            pending.append(i)
+    if not pending:
+        return results
+
+    client = get_client()
+    if batch_id is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = f'data/batch_{name}_{timestamp}.jsonl'
+        write_batch_file(path, [keys[i] for i in pending], [message_lists[i] for i in pending], response_format, model)
+        batch_id = submit_batch(client, path, description=name)
+        print(f"Submitted batch {batch_id} with {len(pending)} requests; resume with --batch-id {batch_id}")
+
+    batch = wait_for_batch(client, batch_id, poll_interval)
+    parsed = read_batch_results(client, batch, response_format)
+    for i in pending:
+        result = parsed.get(str(keys[i]))
+        if result is not None:
+            results[i] = result
+            if cache is not None:
+                cache.set(cache_keys[i], result)
+    return results
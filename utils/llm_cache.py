@@ -0,0 +1,94 @@
+import hashlib
+import json
+import sqlite3
+import time
+from utils.metrics import inc
+
+
+class LLMCache:
+    """
+    On-disk cache of parsed structured-output completions, stored in SQLite.
+
+    Entries are keyed by a hash of (model, messages, response_format schema), so a
+    change to the prompt, the input row or the output model is a miss, while
+    re-running unchanged rows costs no API call. Entries not used for
+    `max_age_days` are evicted, as are the least recently used ones beyond
+    `max_entries`; clear() drops everything.
+    """
+
+    def __init__(self, path='data/llm_cache.sqlite', max_age_days=None, max_entries=None):
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+        self.evict()
+
+    @staticmethod
+    def key(model, messages, response_format):
+        payload = json.dumps({
+            'model': model,
+            'messages': messages,
+            'schema': response_format.model_json_schema(),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, response_format):
+        """Return the cached parsed object for `key`, or None on a miss."""
+        row = self.conn.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            inc('llm_cache_lookups_total', result='miss')
+            return None
+        self.hits += 1
+        inc('llm_cache_lookups_total', result='hit')
+        with self.conn:
+            self.conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return response_format.model_validate_json(row[0])
+
+    def set(self, key, parsed):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, parsed.model_dump_json(), now, now),
+            )
+
+    def evict(self):
+        """Apply the age and size limits."""
+        with self.conn:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self.conn.execute("DELETE FROM completions WHERE last_used < ?", (cutoff,))
+            if self.max_entries is not None:
+                self.conn.execute(
+                    "DELETE FROM completions WHERE key NOT IN "
+                    "(SELECT key FROM completions ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM completions")
+
+    def stats(self):
+        (entries,) = self.conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+    def close(self):
+        self.conn.close()
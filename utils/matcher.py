@@ -0,0 +1,88 @@
+"""
+Multi-pattern substring matching of company-name variants against disclosures.
+
+VariantMatcher is an Aho-Corasick automaton built once from all variants; it finds
+every occurrence of every variant in a text in a single left-to-right scan, instead
+of testing `variant in text` for each variant separately.
+"""
+
+from collections import deque
+import pandas as pd
+
+
+class VariantMatcher:
+    def __init__(self, patterns):
+        # empty patterns never count as a mention
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        # trie of all patterns
+        for i, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                nxt = self.goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(i)
+
+        # failure links, breadth first; each node also reports the matches of its fail node
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[nxt] = self.goto[fail].get(char, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def finditer(self, text):
+        """Yield (start, pattern) for every occurrence of every pattern in `text`."""
+        goto, fail, out, patterns = self.goto, self.fail, self.out, self.patterns
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for i in out[node]:
+                yield position - len(patterns[i]) + 1, patterns[i]
+
+    def find_all(self, text):
+        """Set of the patterns that occur in `text`."""
+        return {pattern for _, pattern in self.finditer(text)}
+
+def match_disclosures(entries, variants):
+    """
+    Every (article, author, disclosure, category, variant) where the disclosure text
+    contains one of the article's own company variants.
+
+    `entries` is the disclosure table from utils.disclosures and `variants` holds
+    (article, variant) rows. Each distinct disclosure text is scanned once with a
+    matcher built from all variants of all articles.
+    """
+    columns = ['article', 'author', 'disclosure', 'category', 'variant']
+    matcher = VariantMatcher(variants['variant'])
+    texts = entries['text'].cat.categories.to_numpy(dtype=object)
+    found = {'code': [], 'variant': []}
+    for code, text in enumerate(texts):
+        for variant in matcher.find_all(text):
+            found['code'].append(code)
+            found['variant'].append(variant)
+    if not found['code']:
+        return pd.DataFrame(columns=columns)
+
+    disclosures = entries.drop_duplicates(['article', 'author', 'disclosure'])
+    disclosures = disclosures[['article', 'author', 'disclosure', 'category']].assign(
+        code=entries['text'].cat.codes)
+    hits = disclosures.merge(pd.DataFrame(found), on='code')
+    # keep only the variants that belong to the disclosure's own article
+    hits = hits.merge(variants.drop_duplicates(), on=['article', 'variant'])
+    return hits[columns]
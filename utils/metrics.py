@@ -0,0 +1,195 @@
+"""
+In-process instrumentation shared by the scraper and the LLM scripts.
+
+Code records counters with inc(), latencies and sizes with observe() or the timer()
+context manager / timed() decorator, each with optional labels:
+
+    with timer('page_load_seconds', fetcher='browser'):
+        driver.get(url)
+    inc('llm_prompt_tokens_total', usage.prompt_tokens, model=model)
+
+Everything is kept in memory; nothing is written until a script calls configure().
+After that every observation is appended to <prefix>.jsonl as one JSON record, and
+<prefix>.prom is rewritten in the Prometheus text format (for the node_exporter
+textfile collector) at most every `flush_interval` seconds and on close().
+"""
+
+import atexit
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# histogram bucket bounds, in seconds for timings
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# recent values kept per histogram for the percentiles in report()
+SAMPLES = 10000
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantile(self, q):
+        values = sorted(self.samples)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (name, sorted label items) -> value / Histogram
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.run = None
+        self.events = None
+        self.prom_path = None
+        self.flush_interval = 30
+        self.last_flush = 0.0
+
+    def configure(self, prefix, flush_interval=30):
+        """Start exporting to <prefix>.jsonl (appended) and <prefix>.prom (rewritten)."""
+        os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+        self.close()
+        self.run = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self.events = open(prefix + '.jsonl', 'a', encoding='utf-8')
+        self.prom_path = prefix + '.prom'
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def _log(self, kind, name, value, labels):
+        if self.events is None:
+            return
+        self.events.write(json.dumps({'ts': time.time(), 'run': self.run, 'type': kind, 'metric': name,
+                                      'labels': labels, 'value': value}) + '\n')
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self._flush()
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+            self._log('counter', name, value, labels)
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            key = (name, tuple(sorted(labels.items())))
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+            self._log('histogram', name, value, labels)
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        typed = set()
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if self.events is not None:
+            self.events.flush()
+        if self.prom_path is not None:
+            with open(self.prom_path + '.tmp', 'w', encoding='utf-8') as file:
+                file.write(self.prometheus())
+            os.replace(self.prom_path + '.tmp', self.prom_path)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            if self.events is not None:
+                self._flush()
+                self.events.close()
+            self.events = None
+            self.prom_path = None
+
+    def report(self):
+        """Human-readable summary: counter totals, and count/p50/p95/total per histogram."""
+        with self.lock:
+            lines = [f"{name}{_labels(labels)}: {_number(value)}" for (name, labels), value in sorted(self.counters.items())]
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                lines.append(f"{name}{_labels(labels)}: n={histogram.count} p50={histogram.quantile(0.5):.3f} "
+                             f"p95={histogram.quantile(0.95):.3f} total={histogram.sum:.1f}")
+        return '\n'.join(lines)
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+def _escape(value):
+    return re.sub(r'(["\\])', r'\\\1', str(value)).replace('\n', '\\n')
+
+METRICS = Metrics()
+atexit.register(METRICS.close)
+
+def configure(prefix, flush_interval=30):
+    METRICS.configure(prefix, flush_interval)
+
+def inc(name, value=1, **labels):
+    METRICS.inc(name, value, **labels)
+
+def observe(name, value, **labels):
+    METRICS.observe(name, value, **labels)
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the wall time of the block in seconds, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe(name, time.perf_counter() - start, **labels)
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def report():
+    return METRICS.report()
@@ -0,0 +1,122 @@
+"""
+Combined wait for the fields of an article page in the browser.
+
+Instead of one WebDriverWait with a 30 s timeout per element, a single poll loop asks
+the page for readyState, the total number of DOM nodes and the presence of every field
+selector in one execute_script call. The loop ends as soon as
+
+- every field is present, or
+- the page is complete and its DOM has not changed for a few polls (what is missing
+  is not coming), or
+- every missing field is past its timeout.
+
+Per-field timeouts are learned from how long each field took to appear on earlier
+pages (twice the 95th percentile, within [MIN_TIMEOUT, MAX_TIMEOUT]) and can be kept
+across runs in a JSON file. The time spent waiting after the last field appeared on a
+page that ended incomplete is the wasted wait, recorded as scrape_wasted_wait_seconds.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from utils.metrics import inc, observe
+
+# field -> CSS selector of the element that holds it
+FIELDS = {
+    'title': 'meta[name="dc.Title"]',
+    'doi': 'meta[name="dc.Identifier"]',
+    'abstract': '#abstract',
+    'publication_date': 'meta[name="dc.Date"]',
+    'authors': '.core-authors',
+}
+# without these the page is not an article
+REQUIRED = ('title', 'doi')
+
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 30.0
+MIN_SAMPLES = 20
+SAMPLES = 500
+
+POLL_SCRIPT = """
+const selectors = arguments[0];
+const found = {};
+for (const field in selectors) {
+    found[field] = document.querySelector(selectors[field]) !== null;
+}
+return {ready: document.readyState, nodes: document.getElementsByTagName('*').length, found: found};
+"""
+
+
+class WaitTimes:
+    """Recent appearance times per field, shared by all crawler threads, and the timeouts learned from them."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.samples = {field: deque(maxlen=SAMPLES) for field in FIELDS}
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                for field, values in json.load(file).items():
+                    if field in self.samples:
+                        self.samples[field].extend(values)
+
+    def record(self, field, seconds):
+        with self.lock:
+            self.samples[field].append(round(seconds, 3))
+
+    def timeout(self, field):
+        """Twice the 95th percentile of the field's appearance times; MAX_TIMEOUT until enough are known."""
+        with self.lock:
+            values = sorted(self.samples[field])
+        if len(values) < MIN_SAMPLES:
+            return MAX_TIMEOUT
+        p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, 2 * p95))
+
+    def save(self):
+        if self.path is None:
+            return
+        with self.lock:
+            data = {field: list(values) for field, values in self.samples.items()}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def wait_for_fields(driver, wait_times, interval=0.1, stable_polls=3):
+    """
+    Poll until the page's fields are present or known to be missing.
+    Returns {field: seconds until it appeared} for the fields that did.
+    """
+    timeouts = {field: wait_times.timeout(field) for field in FIELDS}
+    start = time.monotonic()
+    found = {}
+    last_nodes = None
+    stable = 0
+    while True:
+        state = driver.execute_script(POLL_SCRIPT, FIELDS)
+        now = time.monotonic() - start
+        for field, present in state['found'].items():
+            if present and field not in found:
+                found[field] = now
+        missing = [field for field in FIELDS if field not in found]
+        if not missing:
+            break
+        # the DOM counts as settled once the page is complete and its size stops changing
+        stable = stable + 1 if state['ready'] == 'complete' and state['nodes'] == last_nodes else 0
+        last_nodes = state['nodes']
+        if stable >= stable_polls or all(now >= timeouts[field] for field in missing):
+            break
+        time.sleep(interval)
+
+    elapsed = time.monotonic() - start
+    for field, seconds in found.items():
+        wait_times.record(field, seconds)
+        observe('scrape_wait_seconds', seconds, field=field)
+    for field in missing:
+        inc('scrape_missing_fields_total', field=field)
+    observe('scrape_wasted_wait_seconds', elapsed - max(found.values(), default=0.0) if missing else 0.0)
+    return found
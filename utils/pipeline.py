@@ -0,0 +1,230 @@
+"""
+Single entry point for the whole workflow:
+
+    urls -> scrape -> company_id -> (human review) -> clean_name -> features
+
+Each stage is one of the existing scripts with declared input and output files; the
+dependencies follow from which stage writes which file. A stage is skipped when its
+command and the content hashes of its inputs are the same as in its last successful run
+and its outputs are unchanged (recorded in data/pipeline_state.json). Stages whose
+dependencies are done run in parallel.
+
+company_id follows the crawl: while the scraper is still appending to
+data/asco_articles.csv, company_id is re-run every --follow-interval seconds with
+--update, labelling only the articles that arrived since its last round, so the LLM
+work overlaps the crawl instead of waiting for it. Each round reads a snapshot of the
+complete rows written so far (data/asco_articles.snapshot.csv), never a row the scraper
+is halfway through, and a failed round is retried in the next one instead of failing the
+stage.
+
+The human review step stays manual: if results/asco_articles_with_company_human_edited.csv
+exists, clean_name reads it; otherwise it reads company_id's output directly.
+
+Usage:
+    python -m utils.pipeline                       # run whatever is out of date
+    python -m utils.pipeline --dry-run             # only show what would run
+    python -m utils.pipeline --stages company_id --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils.dataset import snapshot
+
+STATE = 'data/pipeline_state.json'
+ARTICLES = 'data/asco_articles.csv'
+WITH_COMPANY = 'results/asco_articles_with_company.parquet'
+REVIEWED = 'results/asco_articles_with_company_human_edited.csv'
+WITH_VARIANTS = 'results/asco_articles_with_company_name_variants.parquet'
+ANALYSIS = 'results/analysis_dataset.csv'
+
+
+class Stage:
+    def __init__(self, name, command, inputs=(), outputs=(), follows=None):
+        self.name = name
+        self.command = command
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # upstream stage whose output this stage can consume incrementally while it runs
+        self.follows = follows
+
+def default_stages(refresh=False):
+    python = sys.executable
+    reviewed = REVIEWED if os.path.exists(REVIEWED) else WITH_COMPANY
+    return [
+        Stage('urls', [python, '-m', 'utils.jco_url_scraper'] + (['--update'] if refresh else []),
+              outputs=['data/jco_urls.jsonl']),
+        Stage('scrape', [python, '-m', 'utils.asco_web_scraper', '--output', ARTICLES],
+              inputs=['data/jco_urls.jsonl'], outputs=[ARTICLES]),
+        Stage('company_id', [python, 'company_id.py', '--input', ARTICLES, '--update', WITH_COMPANY, '--output', WITH_COMPANY],
+              inputs=[ARTICLES], outputs=[WITH_COMPANY], follows='scrape'),
+        Stage('clean_name', [python, 'company_clean_name.py', '--input', reviewed, '--update', WITH_VARIANTS, '--output', WITH_VARIANTS],
+              inputs=[reviewed], outputs=[WITH_VARIANTS]),
+        Stage('features', [python, '-m', 'utils.coi_features', WITH_VARIANTS, ANALYSIS],
+              inputs=[WITH_VARIANTS], outputs=[ANALYSIS]),
+    ]
+
+def file_hash(path):
+    """sha256 of a file's content, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def signature(stage):
+    """Hash of a stage's command and the content of its inputs."""
+    digest = hashlib.sha256(json.dumps(stage.command[1:]).encode())
+    for path in stage.inputs:
+        digest.update(f"{path}:{file_hash(path)}".encode())
+    return digest.hexdigest()
+
+def snapshot_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.snapshot{ext}"
+
+
+class Pipeline:
+    def __init__(self, stages, state_path=STATE, follow_interval=300, dry_run=False):
+        self.stages = {stage.name: stage for stage in stages}
+        producers = {output: stage.name for stage in stages for output in stage.outputs}
+        self.deps = {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages}
+        self.state_path = state_path
+        self.state = {}
+        if os.path.exists(state_path):
+            with open(state_path) as file:
+                self.state = json.load(file)
+        self.lock = threading.Lock()
+        self.follow_interval = follow_interval
+        self.dry_run = dry_run
+
+    def is_current(self, stage):
+        """Whether the last successful run had the same signature and left the outputs as they are."""
+        recorded = self.state.get(stage.name)
+        if recorded is None or recorded['signature'] != signature(stage):
+            return False
+        return all(recorded['outputs'].get(path) == file_hash(path) is not None for path in stage.outputs)
+
+    def _record(self, stage, stage_signature):
+        with self.lock:
+            self.state[stage.name] = {
+                'signature': stage_signature,
+                'outputs': {path: file_hash(path) for path in stage.outputs},
+                'finished': time.time(),
+            }
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            with open(self.state_path + '.tmp', 'w') as file:
+                json.dump(self.state, file, indent=1)
+            os.replace(self.state_path + '.tmp', self.state_path)
+
+    def _execute(self, stage, follow=False):
+        """
+        Run a stage's command and record it as done. With `follow`, its inputs are still
+        being appended to, so the command reads snapshots of their complete records; the
+        run is only recorded if nothing was left out.
+        """
+        if self.dry_run:
+            print(f"[{stage.name}] would run: {' '.join(stage.command)}")
+            return
+        stage_signature = signature(stage)
+        command = stage.command
+        complete = True
+        snapshots = []
+        if follow:
+            for path in stage.inputs:
+                complete &= snapshot(path, snapshot_path(path))
+                snapshots.append(snapshot_path(path))
+                command = [snapshot_path(path) if part == path else part for part in command]
+        start = time.perf_counter()
+        print(f"[{stage.name}] running: {' '.join(command)}")
+        try:
+            subprocess.run(command, check=True)
+        finally:
+            for path in snapshots:
+                os.remove(path)
+        print(f"[{stage.name}] done in {time.perf_counter() - start:.0f}s")
+        if complete:
+            self._record(stage, stage_signature)
+
+    def _run(self, stage, force, upstream=None):
+        """Run one stage; while `upstream` is still running, keep re-running on what it has produced so far."""
+        rounds = 0
+        while upstream is not None and not upstream.done():
+            if all(os.path.exists(path) for path in stage.inputs) and not self.is_current(stage):
+                try:
+                    self._execute(stage, follow=True)
+                    rounds += 1
+                except subprocess.CalledProcessError as e:
+                    # the upstream stage is still running; the next round gets another chance
+                    print(f"[{stage.name}] round failed, retrying in {self.follow_interval}s: {str(e)}")
+            wait([upstream], timeout=self.follow_interval)
+        if upstream is not None and upstream.exception() is not None:
+            return 'cancelled'
+        if not force and self.is_current(stage):
+            if rounds:
+                return 'ran'
+            print(f"[{stage.name}] up to date, skipped")
+            return 'skipped'
+        self._execute(stage)
+        return 'would run' if self.dry_run else 'ran'
+
+    def run(self, selected=None, force=False):
+        """Run the selected stages (default: all) in dependency order, in parallel where possible."""
+        selected = set(selected or self.stages)
+        futures = {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(self.stages)) as pool:
+            while len(results) < len(selected):
+                for name in selected - set(futures):
+                    stage = self.stages[name]
+                    deps = self.deps[name] & selected
+                    if any(results.get(dep) in ('failed', 'cancelled') for dep in deps):
+                        results[name] = 'cancelled'
+                        futures[name] = None
+                        print(f"[{name}] cancelled: a dependency failed")
+                    elif all(dep in results for dep in deps):
+                        futures[name] = pool.submit(self._run, stage, force)
+                    elif stage.follows in deps and stage.follows in futures and all(
+                            dep in results for dep in deps - {stage.follows}):
+                        futures[name] = pool.submit(self._run, stage, force, futures[stage.follows])
+
+                running = [future for name, future in futures.items() if future is not None and name not in results]
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for name, future in futures.items():
+                    if future in finished:
+                        try:
+                            results[name] = future.result()
+                        except Exception as e:
+                            print(f"[{name}] failed: {str(e)}")
+                            results[name] = 'failed'
+        return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping stages whose inputs have not changed")
+    parser.add_argument('--stages', nargs='+', help="only run these stages (default: all)")
+    parser.add_argument('--force', action='store_true', help="run the selected stages even if they are up to date")
+    parser.add_argument('--refresh', action='store_true', help="query PubMed for new articles (jco_url_scraper --update)")
+    parser.add_argument('--follow-interval', type=int, default=300, help="seconds between company_id rounds while the crawl is running")
+    parser.add_argument('--dry-run', action='store_true', help="print the commands instead of running them")
+    args = parser.parse_args()
+
+    stages = default_stages(refresh=args.refresh)
+    pipeline = Pipeline(stages, follow_interval=args.follow_interval, dry_run=args.dry_run)
+    unknown = set(args.stages or ()) - set(pipeline.stages)
+    if unknown:
+        parser.error(f"unknown stages {sorted(unknown)}; choose from {list(pipeline.stages)}")
+    results = pipeline.run(args.stages, force=args.force or args.refresh)
+    for name in pipeline.stages:
+        if name in results:
+            print(f"{name}: {results[name]}")
+    sys.exit(1 if 'failed' in results.values() else 0)
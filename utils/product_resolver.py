@@ -0,0 +1,158 @@
+"""
+Local product -> manufacturer lookup that answers company_id.py for abstracts about
+well-known products, so only the ambiguous ones are sent to the LLM.
+
+The table is seeded from earlier answers in results/ (the reviewed
+asco_articles_with_company_human_edited file takes precedence over raw LLM outputs).
+Rows whose company_source is 'resolver' are skipped, so the resolver never counts its own
+earlier answers as evidence and an early mistake cannot reinforce itself; every row of
+the reviewed file counts, as a human has checked it.
+A product is kept only if it was seen in at least `min_count` articles and at least
+`agreement` of them name the same manufacturer, so generics with several makers and
+products that changed hands (e.g. Genentech/Roche) are left to the LLM. All product
+names are indexed in one Aho-Corasick matcher and looked up in the title and abstract.
+
+Usage:
+    python -m utils.product_resolver          # print the seeded table
+"""
+
+import argparse
+import glob
+import os
+import re
+from collections import Counter, defaultdict
+import pandas as pd
+import pyarrow.parquet as pq
+from utils.companies import company_key, is_company, same_company
+from utils.dataset import load
+from utils.matcher import VariantMatcher
+
+NO_PRODUCT = {'', 'n/a', 'na', 'none', 'unsure', 'unknown'}
+REVIEWED = 'asco_articles_with_company_human_edited'
+# stems of targeted-agent generic names (-mab antibodies, -nib/-lib kinase inhibitors, ...)
+DRUG_NAME = re.compile(r'\b[a-z]+(?:mab|nib|lib|sib|mib|cept|parib|degib|ciclib|leucel)\b')
+
+def seed_files(results_dir='results'):
+    """Earlier company_id outputs, oldest first and the reviewed file last; Parquet preferred over CSV."""
+    tables = {}
+    for path in glob.glob(os.path.join(results_dir, 'asco_articles_with_company*')):
+        stem, extension = os.path.splitext(path)
+        if extension == '.parquet' or (extension == '.csv' and stem not in tables):
+            tables[stem] = path
+    return sorted(tables.values(), key=lambda path: (REVIEWED in path, os.path.getmtime(path)))
+
+def _columns(path):
+    if path.endswith('.parquet'):
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def load_answers(paths):
+    """
+    (product_name, company_name) per article title from LLM- or human-sourced rows;
+    later files override earlier ones.
+    """
+    answers = {}
+    for path in paths:
+        columns = set(_columns(path))
+        if not {'title', 'product_name', 'company_name'} <= columns:
+            continue
+        sourced = 'company_source' in columns and REVIEWED not in path
+        df = load(path, columns=['title', 'product_name', 'company_name'] + (['company_source'] if sourced else []))
+        if sourced:
+            df = df[df['company_source'] != 'resolver'].drop(columns='company_source')
+        for title, product, company in df.itertuples(index=False):
+            if isinstance(title, str):
+                answers[title.strip().lower()] = (product, company)
+    return list(answers.values())
+
+def _is_word(text, start, end):
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+class ProductResolver:
+    def __init__(self, answers, min_count=3, agreement=0.9):
+        companies = defaultdict(Counter)
+        product_spellings = defaultdict(Counter)
+        company_spellings = defaultdict(Counter)
+        for product, company in answers:
+            if not isinstance(product, str) or product.strip().lower() in NO_PRODUCT:
+                continue
+            key = product.strip().lower()
+            # very short names ("S-1", "TAS") match too much unrelated text
+            if len(key) < 4:
+                continue
+            company_name = company_key(company) if is_company(company) else ''
+            companies[key][company_name or 'n/a'] += 1
+            product_spellings[key][product.strip()] += 1
+            if company_name:
+                company_spellings[company_name][company.strip()] += 1
+
+        # product key -> (product name, company name), for the unambiguous products only
+        self.table = {}
+        for key, counts in companies.items():
+            total = sum(counts.values())
+            company, count = counts.most_common(1)[0]
+            if total >= min_count and count / total >= agreement:
+                name = company_spellings[company].most_common(1)[0][0] if company != 'n/a' else 'N/A'
+                self.table[key] = (product_spellings[key].most_common(1)[0][0], name)
+        self.matcher = VariantMatcher(self.table)
+
+    @classmethod
+    def from_results(cls, results_dir='results', min_count=3, agreement=0.9):
+        return cls(load_answers(seed_files(results_dir)), min_count=min_count, agreement=agreement)
+
+    def mentions(self, text):
+        """Known products named in `text` as whole words, ignoring ones inside a longer match."""
+        text = text.lower()
+        spans = sorted(
+            ((start, start + len(product), product) for start, product in self.matcher.finditer(text)
+             if _is_word(text, start, start + len(product))),
+            key=lambda span: (span[0], -span[1]),
+        )
+        found = []
+        end = -1
+        for start, stop, product in spans:
+            if stop > end:
+                found.append(product)
+                end = stop
+        return found
+
+    def makers(self, text):
+        """Known manufacturers of the products named in `text`."""
+        return [self.table[product][1] for product in self.mentions(text) if is_company(self.table[product][1])]
+
+    def resolve(self, title, abstract, coi_companies):
+        """
+        (product_name, company_name, company_in_the_list) when the article is clearly about
+        a single known product, i.e. it is the only known product mentioned, it appears
+        in the title or at least twice in the abstract, and no unknown targeted agent is
+        named; None otherwise.
+        """
+        title = title if isinstance(title, str) else ''
+        abstract = abstract if isinstance(abstract, str) else ''
+        in_title = self.mentions(title)
+        in_abstract = self.mentions(abstract)
+        products = set(in_title) | set(in_abstract)
+        if len(products) != 1:
+            return None
+        (product,) = products
+        if not in_title and in_abstract.count(product) < 2:
+            return None
+        # a targeted agent that the table does not know may be the primary product
+        if any(name not in self.table for name in DRUG_NAME.findall(f"{title}\n{abstract}".lower())):
+            return None
+        product_name, company_name = self.table[product]
+        in_list = is_company(company_name) and any(same_company(company_name, company) for company in coi_companies)
+        return product_name, company_name, in_list
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the product -> manufacturer table seeded from results/")
+    parser.add_argument('--results', default='results', help="directory of earlier company_id outputs")
+    parser.add_argument('--min-count', type=int, default=3, help="articles a product must appear in")
+    parser.add_argument('--agreement', type=float, default=0.9, help="share of those articles that must agree on the company")
+    args = parser.parse_args()
+
+    resolver = ProductResolver.from_results(args.results, min_count=args.min_count, agreement=args.agreement)
+    for key in sorted(resolver.table):
+        print(' -> '.join(resolver.table[key]))
+    print(f"{len(resolver.table)} products")
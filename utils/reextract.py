@@ -0,0 +1,73 @@
+"""
+Re-run the article extractors over the raw HTML archive, without any network access.
+
+Pages are decompressed and parsed in parallel worker processes; rows are written by
+the main process in DOI order, in the same CSV format as asco_web_scraper or as Parquet.
+
+With --compare-parsers nothing is written: every archived page is parsed with both
+html.parser and lxml and the pages whose extracted fields differ are listed, to check
+the lxml default against real JCO markup.
+
+Usage:
+    python -m utils.reextract --archive data/html_archive --output data/asco_articles_reextracted.csv
+    python -m utils.reextract --compare-parsers
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from utils.html_archive import HtmlArchive, read_page
+from utils.static_scraper import parse_article_html
+from utils.asco_web_scraper import HEADERS
+from utils.dataset import save
+
+def extract_page(path):
+    """Worker: parse one archived page into a row (None if it cannot be parsed)."""
+    try:
+        return parse_article_html(read_page(path))
+    except Exception as e:
+        print(f"Could not re-extract {path}: {str(e)}")
+        return None
+
+def compare_page(path):
+    """Worker: the fields of one archived page that html.parser and lxml extract differently."""
+    html = read_page(path)
+    try:
+        reference = parse_article_html(html, 'html.parser')
+        result = parse_article_html(html, 'lxml')
+    except Exception as e:
+        return [f"error: {str(e)}"]
+    return [field for field in reference if reference[field] != result[field]]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract article fields from the raw HTML archive")
+    parser.add_argument('--archive', default='data/html_archive', help="directory of the raw HTML archive")
+    parser.add_argument('--output', default='data/asco_articles_reextracted.csv', help="table to write (.parquet for Parquet, CSV otherwise)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--compare-parsers', action='store_true', help="only report pages that html.parser and lxml extract differently")
+    args = parser.parse_args()
+
+    archive = HtmlArchive(args.archive)
+    paths = []
+    for doi, url, digest in archive.pages():
+        path = archive.path(digest)
+        if path is None:
+            print(f"Warning: Archived page for {doi} is missing")
+            continue
+        paths.append(path)
+    archive.close()
+
+    if args.compare_parsers:
+        with ProcessPoolExecutor(args.workers) as pool:
+            differing = [(path, fields) for path, fields in zip(paths, pool.map(compare_page, paths, chunksize=16)) if fields]
+        for path, fields in differing:
+            print(f"{path}: {', '.join(fields)}")
+        print(f"{len(differing)} of {len(paths)} archived pages differ between html.parser and lxml")
+        raise SystemExit(1 if differing else 0)
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        rows = [row for row in pool.map(extract_page, paths, chunksize=16) if row is not None]
+    save(pd.DataFrame(rows, columns=HEADERS), args.output)
+
+    print(f"Re-extracted {len(rows)} of {len(paths)} archived pages to {args.output}")
@@ -0,0 +1,129 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+from utils.utils import extract_author_coi, HTML_PARSER
+from utils.metrics import inc, timer, timed
+from utils.countries import affiliation_countries
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+_local = threading.local()
+
+def get_http_session(pool_size=10):
+    """
+    Return this thread's requests.Session, creating it on first use.
+    The session keeps connections alive between articles and accepts gzip responses.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Encoding': 'gzip, deflate',
+            'Accept-Language': 'en-US,en;q=0.9',
+        })
+        _local.session = session
+    return session
+
+def fetch_html(url, session=None, timeout=30):
+    """Fetch the raw HTML of a page with a plain HTTP GET."""
+    session = session or get_http_session()
+    with timer('page_load_seconds', fetcher='http'):
+        response = session.get(url, timeout=timeout)
+    inc('http_responses_total', status=response.status_code)
+    response.raise_for_status()
+    return response.text
+
+def _text(tag):
+    # Collapse whitespace the way the browser's rendered .text does
+    return " ".join(tag.get_text(" ").split())
+
+def _meta(soup, name):
+    tag = soup.find('meta', attrs={'name': name})
+    return tag.get('content') if tag else None
+
+@timed('parse_article_seconds')
+def parse_article_html(html, parser=None):
+    """
+    Extract the same fields as scrape_asco_article from a page's HTML, without a browser.
+    Returns a dict with title, authors, abstract, publication_date, doi,
+    author_disclosures and countries. The page is parsed once, with lxml when installed
+    (or `parser`), and the disclosures are read from the same tree.
+    """
+    soup = BeautifulSoup(html, parser or HTML_PARSER)
+
+    title = _meta(soup, 'dc.Title')
+    author_names = [tag.get('content') for tag in soup.find_all('meta', attrs={'name': 'dc.Creator'})]
+    doi = _meta(soup, 'dc.Identifier')
+    pub_date = _meta(soup, 'dc.Date') or "Publication date not found"
+
+    # Abstract: structured (sections with a heading) or plain paragraphs
+    abstract = "Abstract not found"
+    abstract_section = soup.find(id='abstract')
+    if abstract_section is not None:
+        abstract_parts = abstract_section.find_all('section')
+        if abstract_parts:
+            abstract_text = []
+            for part in abstract_parts:
+                section_title = part.find('h3')
+                content = part.select_one('div[role="paragraph"]')
+                if section_title is None or content is None:
+                    continue
+                abstract_text.append(f"{_text(section_title)}: {_text(content)}")
+            abstract = "\n\n".join(abstract_text)
+        else:
+            paragraphs = abstract_section.select('div[role="paragraph"]')
+            abstract = "\n\n".join(_text(para) for para in paragraphs)
+
+    countries = []
+    authors_section = soup.find(class_='core-authors')
+    if authors_section is not None:
+        affiliations = authors_section.select(
+            'div.affiliations div[property="affiliation"][typeof="Organization"] span[property="name"]'
+        )
+        countries = affiliation_countries(affiliation.get_text() for affiliation in affiliations)
+
+    return {
+        "title": title,
+        "authors": author_names,
+        "abstract": abstract,
+        "publication_date": pub_date,
+        "doi": doi,
+        "author_disclosures": extract_author_coi(soup),
+        "countries": countries
+    }
+
+def is_complete(result):
+    """
+    Whether a static parse found everything the browser path would, so no fallback is needed.
+    Pages without an abstract section (editorials, letters, corrections) are complete with
+    "Abstract not found", as in the browser; an abstract section that yielded no text is not.
+    """
+    return bool(
+        result
+        and result['title']
+        and result['doi']
+        and result['authors']
+        and result['abstract'] != ""
+    )
+
+def scrape_asco_article_static(url, session=None):
+    """
+    Scrape one article over plain HTTP. Returns the parsed fields, or None if the page
+    could not be fetched (e.g. a bot challenge) or came back incomplete.
+    """
+    try:
+        html = fetch_html(url, session)
+    except requests.RequestException as e:
+        print(f"Static fetch failed for {url}: {str(e)}")
+        return None
+    result = parse_article_html(html)
+    if not is_complete(result):
+        return None
+    result['html'] = html
+    return result
@@ -7,7 +7,9 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from datetime import datetime
 from bs4 import BeautifulSoup
+import bisect
 import re
+from utils.metrics import inc, timer, timed
 
 def get_webdriver():
     chrome_options = Options()
@@ -24,32 +26,170 @@ def get_webdriver():
         print(f"Chrome setup failed: {str(e)}")
         raise Exception("Failed to initialize Chrome webdriver")
     
+class DriverSession:
+    """
+    Keep a long-lived Chrome webdriver and hand it out page after page, instead of
+    launching a fresh browser for every URL.
+    The driver is recycled after `max_pages` page loads (to cap Chrome's memory growth)
+    or after a crash via reset(); the next get() then starts a new one.
+    """
+
+    def __init__(self, max_pages=200):
+        self.max_pages = max_pages
+        self.driver = None
+        self.pages = 0
+        self.starts = 0
+
+    def get(self):
+        """Return a live driver, starting or recycling one if needed."""
+        if self.driver is not None and self.pages >= self.max_pages:
+            inc('driver_recycles_total')
+            self.quit()
+        if self.driver is None:
+            with timer('driver_start_seconds'):
+                self.driver = get_webdriver()
+            inc('driver_starts_total')
+            self.starts += 1
+            self.pages = 0
+        self.pages += 1
+        return self.driver
+
+    def reset(self):
+        """Throw away the current driver, e.g. after it crashed."""
+        inc('driver_resets_total')
+        self.quit()
+
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.quit()
+
 def get_html_from_url(url):
     """
     Fetch HTML content from a given URL using Selenium webdriver.
     """
-    driver = get_webdriver()
+    with timer('driver_start_seconds'):
+        driver = get_webdriver()
+    inc('driver_starts_total')
     try:
-        driver.get(url)
-        # Wait up to 10 seconds for the page to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
+        with timer('page_load_seconds', fetcher='get_html_from_url'):
+            driver.get(url)
+            # Wait up to 10 seconds for the page to load
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
         return driver.page_source
     except TimeoutException:
+        inc('scrape_timeouts_total', field='body')
         raise Exception("Page load timed out")
     except Exception as e:
         raise Exception(f"Failed to fetch URL: {str(e)}")
     finally:
         driver.quit()
 
-def extract_author_coi(html_content):
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+DISCLOSURE_TITLE = "Authors' Disclosures of Potential Conflicts of Interest"
+DISCLOSURE_TITLE_CURLY = "Authors’ Disclosures of Potential Conflicts of Interest"
+
+# lxml builds the tree several times faster than the pure-Python html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+def _block_tags(heading, block_end):
+    """The top-level nodes of one disclosure block: the heading's siblings up to block_end."""
+    nodes = []
+    nxt = heading.next_sibling
+    while nxt and nxt != block_end:
+        nodes.append(nxt)
+        nxt = nxt.next_sibling
+    return nodes
+
+def _descendants(nodes, match):
+    """Tags among `nodes` and their descendants that satisfy `match`, in document order."""
+    found = []
+    for node in nodes:
+        if node.name is None:
+            continue
+        if match(node):
+            found.append(node)
+        found.extend(node.find_all(match))
+    return found
+
+def _label_disclosures(block, all_disclosures):
+    """
+    SCENARIO B: one <div>/<p> holding all authors, grouped under <b> labels like
+    <b>Employment or Leadership Position:</b> Robert Weaver, Florida Cancer Specialists (C); ...
+    The block's text and the positions of every label in it are computed once.
     """
-    Given a single HTML string, parse out each author's name
+    b_tags = block.find_all("b")
+    if not b_tags:
+        return
+    parent_text = block.get_text(" ", strip=True)
+    raw_labels = [btag.get_text(" ", strip=True) for btag in b_tags]
+
+    # start positions of every occurrence of every label, sorted
+    label_positions = sorted({
+        mm.start()
+        for label in set(raw.rstrip(':') for raw in raw_labels)
+        for mm in re.finditer(re.escape(label), parent_text)
+    })
+
+    for raw_label in raw_labels:
+        # e.g. "Employment or Leadership Position:" -> "Employment or Leadership:"
+        label_clean = raw_label.replace(" Position", "")
+        label_clean = re.sub(r':$', '', label_clean).strip() + ":"
+
+        # the text after the label, up to the next label
+        m = re.search(re.escape(raw_label.rstrip(':')) + r':?\s*(.*)', parent_text)
+        if not m:
+            continue
+        authors_string = m.group(1)
+        our_start = m.start(1)
+        k = bisect.bisect_right(label_positions, our_start)
+        if k < len(label_positions):
+            authors_string = authors_string[:label_positions[k] - our_start]
+
+        # "Robert Weaver, Florida Cancer Specialists (C); Elizabeth Crowley, Celldex Therapeutics (C)"
+        for chunk in (p.strip() for p in authors_string.split(';')):
+            if not chunk:
+                continue
+            # author name up to the first comma, institution after it minus any (C)
+            author = chunk
+            institution = ""
+            if ',' in chunk:
+                author, institution = chunk.split(',', 1)
+                author = author.strip()
+                institution = re.sub(r'\(C\)', '', institution.strip()).strip()
+
+            all_disclosures.append({
+                "Author": author,
+                "Disclosures": [f"{label_clean} {institution}" if institution else label_clean]
+            })
+
+@timed('extract_author_coi_seconds')
+def extract_author_coi(html_content, parser=None):
+    """
+    Given a single HTML string (or an already parsed BeautifulSoup of it), parse out each author's name
     and their 'Conflicts of Interest' statements from any sections
     labeled with 'Authors' Disclosures of Potential Conflicts of Interest'.
     Skips the first author and their disclosures, which is not real author but a title.
 
+    The page is parsed once (with lxml when installed, or `parser`) and each
+    disclosure block is walked in place, without re-serializing or re-parsing it.
+    Passing a soup reuses the caller's parse; the tree is not modified.
+
     Returns a list of dictionaries:
     [
       {
@@ -60,162 +200,59 @@ def extract_author_coi(html_content):
     ]
     """
 
-    soup = BeautifulSoup(html_content, "html.parser")
+    if isinstance(html_content, BeautifulSoup):
+        soup = html_content
+    else:
+        soup = BeautifulSoup(html_content, parser or HTML_PARSER)
 
     # Find all headings that match "Authors' Disclosures..."
-    # We look through all heading tags (h1–h6).
     disclosure_headings = []
-    for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+    for tag in soup.find_all(HEADING_TAGS):
         text = tag.get_text()
-        if "Authors' Disclosures of Potential Conflicts of Interest" in text or \
-            "Authors’ Disclosures of Potential Conflicts of Interest" in text:
+        if DISCLOSURE_TITLE in text or DISCLOSURE_TITLE_CURLY in text:
             disclosure_headings.append(tag)
 
-    # Helper: check if a tag is any heading
-    def is_heading(tag):
-        return tag.name in ["h1", "h2", "h3", "h4", "h5", "h6"]
-    
+    # Author headings are any headings in the block except one re-mentioning the title
+    def is_author_heading(tag):
+        return tag.name in HEADING_TAGS and DISCLOSURE_TITLE not in tag.get_text()
+
     all_disclosures = []
 
     # Parse each COI block separately
     for i, heading in enumerate(disclosure_headings):
         # The block ends at the next "Authors' Disclosures..." heading or EOF
         block_end = disclosure_headings[i+1] if (i+1 < len(disclosure_headings)) else None
+        block = _block_tags(heading, block_end)
+        top_level = set(id(node) for node in block)
+        after_block = block[-1].next_sibling if block else None
 
-        # Gather all siblings between this heading and block_end
-        content_tags = []
-        nxt = heading.next_sibling
-        while nxt and nxt != block_end:
-            content_tags.append(nxt)
-            nxt = nxt.next_sibling
+        author_headings = _descendants(block, is_author_heading)
 
-        # Create a temporary soup of just this block
-        block_soup = BeautifulSoup("".join(str(t) for t in content_tags), "html.parser")
+        if author_headings:
+            # SCENARIO A: one sub-heading per author, followed by their disclosures.
+            # Skip the first one, which is a title rather than an author.
+            for j in range(1, len(author_headings)):
+                author_tag = author_headings[j]
+                next_heading = author_headings[j+1] if (j+1 < len(author_headings)) else None
+                # a heading at the block's top level must not run past the block
+                stop = after_block if id(author_tag) in top_level else None
 
-        # Find sub-headings that appear to be author names
-        # (excludes the heading that might re-mention "Authors' Disclosures...")
-        author_headings = []
-        for htag in block_soup.find_all(is_heading):
-            if "Authors' Disclosures of Potential Conflicts of Interest" not in htag.get_text():
-                author_headings.append(htag)
+                disclosures = []
+                sibling = author_tag.next_sibling
+                while sibling and sibling != next_heading and (stop is None or sibling is not stop):
+                    if sibling.name in ["div", "p"]:
+                        text_content = sibling.get_text(" ", strip=True)
+                        if text_content:
+                            disclosures.append(text_content)
+                    sibling = sibling.next_sibling
 
-        # For each author heading, gather the paragraphs/divs until the next author heading
-        if author_headings:
-            for j, author_tag in enumerate(author_headings):
-                # Skip the first author (j == 0)
-                if j == 0:
-                    continue
-            
-            author_name = author_tag.get_text(strip=True)
-
-            # The next heading (author) is our boundary
-            next_heading = author_headings[j+1] if (j+1 < len(author_headings)) else None
-
-            disclosures = []
-            sibling = author_tag.next_sibling
-            while sibling and sibling != next_heading:
-                # If it's a div/p (or similar) that contains text, capture it
-                if sibling.name in ["div", "p"]:
-                    text_content = sibling.get_text(" ", strip=True)
-                    if text_content:
-                        disclosures.append(text_content)
-                sibling = sibling.next_sibling
-
-            # Store the data
-            all_disclosures.append({
-                "Author": author_name,
-                "Disclosures": disclosures
-            })
+                all_disclosures.append({
+                    "Author": author_tag.get_text(strip=True),
+                    "Disclosures": disclosures
+                })
 
         else:
-            # SCENARIO B: No author subheadings. All authors in one or more <div>/<p> blocks with <b> labels.
-            text_blocks = block_soup.find_all(["div", "p"])
-            for block in text_blocks:
-                b_tags = block.find_all("b")
-                # For each <b> label like: <b>Employment or Leadership Position:</b> ...
-                for btag in b_tags:
-                    raw_label = btag.get_text(" ", strip=True)  # e.g. "Employment or Leadership Position:"
-                    parent_text = block.get_text(" ", strip=True)
-
-                    # (A) Normalize the label
-                    #     1) Drop the word " Position" if present
-                    #     2) Ensure we have "Employment or Leadership:" form
-                    #     3) Remove trailing colon for easier pattern match
-                    label_clean = raw_label.replace(" Position", "")  # remove " Position"
-                    label_clean = re.sub(r':$', '', label_clean).strip()  # remove trailing colon
-                    # e.g. "Employment or Leadership"
-
-                    # We'll keep it consistent by re-adding a colon for final output
-                    label_clean += ":"
-
-                    # (B) Find the text chunk that belongs to this label
-                    #    We locate everything after the label, up to the next <b> label
-                    #    by scanning the entire block's text.
-                    #    We'll form a small pattern for our label, ignoring optional colon/spaces
-                    pattern_label = re.escape(raw_label.rstrip(':')) + r':?\s*(.*)'
-                    # e.g. "Employment\ or\ Leadership\ Position:?\s*(.*)"
-
-                    m = re.search(pattern_label, parent_text)
-                    if not m:
-                        continue  # can't find text after the label
-
-                    # We'll get the substring from the match
-                    authors_string = m.group(1)
-
-                    # Next label starts?
-                    # We'll gather all other <b> labels in this block and see which one starts after this
-                    all_labels_in_block = []
-                    for other_b in b_tags:
-                        other_l = other_b.get_text(" ", strip=True).rstrip(':')
-                        for mm in re.finditer(re.escape(other_l), parent_text):
-                            all_labels_in_block.append((mm.start(), other_l))
-                    all_labels_in_block.sort(key=lambda x: x[0])
-
-                    # Our substring begins at m.start(1)
-                    our_start = m.start(1)
-                    next_label_index = None
-                    for (pos, lbl) in all_labels_in_block:
-                        if pos > our_start:
-                            next_label_index = pos
-                            break
-
-                    if next_label_index:
-                        length_to_cut = next_label_index - our_start
-                        authors_string = authors_string[:length_to_cut]
-
-                    # (C) Now we have the chunk for this label, e.g.
-                    #   "Robert Weaver, Florida Cancer Specialists (C); Elizabeth Crowley, Celldex Therapeutics (C)"
-                    # Split on semicolons
-                    people_chunks = [p.strip() for p in authors_string.split(';') if p.strip()]
-
-                    for chunk in people_chunks:
-                        # chunk e.g. "Robert Weaver, Florida Cancer Specialists (C)"
-                        # We'll parse:
-                        #   - author name: everything up to the first comma
-                        #   - institution: everything after the comma, minus any trailing (C)
-                        author = chunk
-                        institution = ""
-
-                        # Attempt to split by the first comma
-                        if ',' in chunk:
-                            parts = chunk.split(',', 1)  # 1 split only
-                            author = parts[0].strip()       # e.g. "Robert Weaver"
-                            institution = parts[1].strip()  # e.g. "Florida Cancer Specialists (C)"
-
-                            # remove trailing (C) if present
-                            institution = re.sub(r'\(C\)', '', institution).strip()
-
-                        # Our final disclosure string
-                        # e.g. "Employment or Leadership: Florida Cancer Specialists"
-                        # We only append the institution if it's not empty
-                        if institution:
-                            disc = f"{label_clean} {institution}"
-                        else:
-                            disc = label_clean  # fallback if we didn't parse an institution
-
-                        all_disclosures.append({
-                            "Author": author,
-                            "Disclosures": [disc]
-                        })
-
-    return all_disclosures
\ No newline at end of file
+            for text_block in _descendants(block, lambda tag: tag.name in ["div", "p"]):
+                _label_disclosures(text_block, all_disclosures)
+
+    return all_disclosures